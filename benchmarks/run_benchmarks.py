@@ -0,0 +1,230 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+
+Benchmarks of GooMPy against a local stub of the static maps api, for example
+
+    python benchmarks/run_benchmarks.py --latency 0.05 --output results.json
+
+The results are written as JSON so that runs can be compared.
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GOOGLE_API_KEY', 'benchmark')
+
+# pylint: disable=wrong-import-position
+import goompy
+from goompy import _goompy_functions
+from stub_server import StubServer
+
+WIDTH = 800
+HEIGHT = 500
+LATITUDE = 52.3755
+LONGITUDE = 4.8994
+ZOOM = 15
+MAPTYPE = 'roadmap'
+MAX_ATTEMPTS = 20  # Attempts of a step when the stub server answers with errors
+
+_RETRIES = [0]
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def _retry(function, *args):
+    # a step fails when one of its tiles fails, the tiles that did arrive are cached
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return function(*args)
+
+        except OSError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+
+            _RETRIES[0] += 1
+
+    return None
+
+
+def _new_view(width=WIDTH, height=HEIGHT):
+    goompy_view = goompy.GooMPy(width, height, LATITUDE, LONGITUDE, ZOOM)
+    _retry(goompy_view.use_map_type, MAPTYPE)
+    return goompy_view
+
+
+def bench_views(repeat):
+    ''' cold views download the tiles, warm views find them in the store or memory '''
+    results = {}
+    for name in ('cold', 'store', 'memory'):
+        times = []
+        for _ in range(repeat):
+            if name == 'cold':
+                goompy.set_tile_store(goompy.SQLiteTileStore(
+                    os.path.join(tempfile.mkdtemp(), 'tiles.mbtiles')))
+
+            if name != 'memory':
+                _goompy_functions._TILE_CACHE.clear()
+
+            times.append(_timed(_new_view)[0])
+
+        results[f'{name}_view_seconds'] = min(times)
+
+    return results
+
+
+def bench_pan(moves):
+    ''' pans in a circle over tiles that are loaded, measures moves per second '''
+    view = _new_view()
+    angles = np.linspace(0, 2 * np.pi, moves)
+    steps = np.diff(np.stack([np.cos(angles), np.sin(angles)]) * 200).round().astype(int)
+
+    # a first round loads the tiles
+    for dx, dy in steps.T:
+        _retry(view.move, int(dx), int(dy))
+
+    seconds, _ = _timed(lambda: [view.move(int(dx), int(dy)) for dx, dy in steps.T])
+    return {'pan_moves_per_second': (moves - 1) / seconds,
+            'pan_move_milliseconds': seconds / (moves - 1) * 1000}
+
+
+def bench_zoom():
+    ''' zooms in and out, blocking and with a preview '''
+    view = _new_view()
+    zoom_in, _ = _timed(_retry, view.use_zoom, ZOOM + 1)
+    zoom_out, _ = _timed(_retry, view.use_zoom, ZOOM)
+    preview, _ = _timed(_retry, view.use_zoom, ZOOM + 1, True)
+    return {'zoom_in_seconds': zoom_in, 'zoom_out_seconds': zoom_out,
+            'zoom_preview_seconds': preview}
+
+
+def bench_conversions(npoints):
+    ''' converts arrays of points between lat, lon and window pixels '''
+    view = _new_view()
+    rng = np.random.default_rng(0)
+    lats = LATITUDE + rng.uniform(-0.05, 0.05, npoints)
+    lons = LONGITUDE + rng.uniform(-0.05, 0.05, npoints)
+
+    seconds, (xs, ys) = _timed(
+        lambda: (view.get_xwin_from_lon_array(lons), view.get_ywin_from_lat_array(lats)))
+    back, _ = _timed(
+        lambda: (view.get_lon_from_x_array(xs), view.get_lat_from_y_array(ys)))
+    return {'to_pixels_points_per_second': npoints / seconds,
+            'to_latlon_points_per_second': npoints / back}
+
+
+def _max_rss():
+    # peak resident memory of the process in bytes, or None where it is not available
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+
+    except ImportError:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def bench_memory():
+    '''
+    Peak memory allocated by Python objects for a cold full screen view and a pan across
+    it, and the peak resident memory of the benchmarks, which includes the images
+    '''
+    goompy.set_tile_store(goompy.SQLiteTileStore(
+        os.path.join(tempfile.mkdtemp(), 'tiles.mbtiles')))
+    _goompy_functions._TILE_CACHE.clear()
+
+    tracemalloc.start()
+    view = _new_view(1920, 1080)
+    for _ in range(20):
+        _retry(view.move, 64, 0)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_python_memory_bytes': peak, 'max_rss_bytes': _max_rss()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks GooMPy against a stub server.')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='response time of the stub server in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02,
+                        help='random variation of the response time in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with an error')
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='rate limit of the downloads in tiles per second')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--moves', type=int, default=200)
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.latency, args.jitter, args.error_rate).start()
+    goompy.set_connection_pool(server.url)
+    _goompy_functions._RATE_LIMITER.configure(args.rate, args.rate)
+    goompy.set_tile_store(goompy.SQLiteTileStore(
+        os.path.join(tempfile.mkdtemp(), 'tiles.mbtiles')))
+
+    results = {}
+    failures = {}
+    benchmarks = [('views', bench_views, (args.repeat,)), ('pan', bench_pan, (args.moves,)),
+                  ('zoom', bench_zoom, ()), ('conversions', bench_conversions, (args.points,)),
+                  ('memory', bench_memory, ())]
+    for name, benchmark, benchmark_args in benchmarks:
+        try:
+            results.update(benchmark(*benchmark_args))
+
+        except OSError as error:
+            failures[name] = str(error)
+
+        print(f'{name}: done', file=sys.stderr)
+
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'results': results,
+        'failures': failures,
+        'retries': _RETRIES[0],
+        'stub_requests': server.requests,
+        'stats': goompy.get_stats().snapshot(),
+    }
+    server.stop()
+
+    with open(args.output, 'w') as jsonfile:
+        json.dump(report, jsonfile, indent=2)
+
+    for name, value in results.items():
+        if value is not None:
+            print(f'{name:32} {value:16.4f}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
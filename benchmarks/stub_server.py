@@ -0,0 +1,134 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import time
+import random
+import threading
+import http.server
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs
+import PIL.Image
+
+STATICMAP_PATH = '/maps/api/staticmap'
+_VARIANTS = 8
+
+
+def _textured_tile(width, height, variant):
+    noise = PIL.Image.effect_noise((width, height), 40)
+    color = PIL.Image.new('RGB', (width, height), (60 + 20 * variant, 140, 200 - 20 * variant))
+    image = PIL.Image.composite(color, PIL.Image.merge('RGB', [noise] * 3), noise)
+    jpgfile = BytesIO()
+    image.save(jpgfile, format='JPEG', quality=85)
+    return jpgfile.getvalue()
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        self.nrequests = 0
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path != STATICMAP_PATH:
+            self.send_error(404)
+            return
+
+        time.sleep(max(0, server.latency + random.uniform(-1, 1) * server.jitter))
+        with server.lock:
+            server.requests += 1
+
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.errors += 1
+
+            self.send_error(500)
+            return
+
+        params = parse_qs(url.query)
+        data = server.tile(params['center'][0], params['size'][0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+        # like a keep-alive timeout, the connection is closed without telling the client
+        self.nrequests += 1
+        if server.keepalive_requests and self.nrequests >= server.keepalive_requests:
+            self.close_connection = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    '''
+    Local stand-in for the static maps api that answers every request after latency
+    plus or minus a random jitter in seconds with a JPEG tile, or with an error for a
+    fraction error_rate of the requests. The color of a tile depends on its center.
+    With keepalive_requests, a connection is closed after that many requests without
+    a Connection: close header.
+    '''
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, port=0,
+                 keepalive_requests=None):
+        http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), _StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.keepalive_requests = keepalive_requests
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self._tiles = {}
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}{STATICMAP_PATH}'
+
+    def tile(self, center, size):
+        '''
+        Returns a JPEG tile of size that depends on center. The tiles are textured so
+        that they encode and decode like map tiles, a few variants are encoded per size.
+        '''
+        with self.lock:
+            if size not in self._tiles:
+                width, height = map(int, size.split('x'))
+                self._tiles[size] = [_textured_tile(width, height, variant)
+                                     for variant in range(_VARIANTS)]
+
+            return self._tiles[size][hash(center) % _VARIANTS]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    SERVER = StubServer(port=8008).start()
+    print(f'stub static maps api on {SERVER.url}')
+    threading.Event().wait()
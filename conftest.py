@@ -0,0 +1,69 @@
+'''fixtures shared by the tests
+'''
+import os
+import sys
+import time
+import pytest
+from goompy import (GooMPy, SQLiteTileStore, _goompy_functions, set_connection_pool,
+                    set_tile_store)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+from stub_server import StubServer  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def make_goompy():
+    '''
+    Returns make_goompy(latitude, longitude, zoom, dx=0, dy=0) that makes a GooMPy of
+    800 x 500 with the view set up as after use_map_type and moved by dx, dy, without
+    fetching tiles
+    '''
+    def make_goompy(latitude, longitude, zoom, dx=0, dy=0):
+        goompy = GooMPy(800, 500, latitude, longitude, zoom)
+        goompy.ntiles = 3
+        goompy.leftx = 960 - goompy.width / 2 + dx
+        goompy.uppery = 960 - goompy.height / 2 + dy
+        return goompy
+
+    return make_goompy
+
+
+@pytest.fixture
+def wait_idle():
+    '''
+    Returns wait_idle(server, quiet=0.3, timeout=10) that waits until the server has had
+    no requests for quiet seconds
+    '''
+    def wait_idle(server, quiet=0.3, timeout=10):
+        end = time.monotonic() + timeout
+        requests = server.requests
+        while time.monotonic() < end:
+            time.sleep(quiet)
+            if server.requests == requests:
+                return
+
+            requests = server.requests
+
+    return wait_idle
+
+
+@pytest.fixture
+def stub_server(tmp_path, monkeypatch):
+    '''
+    Stub of the static maps api, the tiles are downloaded from it into an empty tile
+    store and tiles cache without rate limit
+    '''
+    monkeypatch.setenv('GOOGLE_API_KEY', 'test')
+    server = StubServer(latency=0.01, jitter=0).start()
+    set_connection_pool(server.url)
+    _goompy_functions._RATE_LIMITER.configure(1000, 100)
+    set_tile_store(SQLiteTileStore(str(tmp_path / 'tiles.mbtiles')))
+    _goompy_functions._TILE_CACHE.clear()
+    yield server
+
+    server.stop()
+    set_connection_pool()
+    _goompy_functions._RATE_LIMITER.configure(_goompy_functions._GRABRATE,
+                                              _goompy_functions._GRABBURST)
+    set_tile_store(None)
+    _goompy_functions._TILE_CACHE.clear()
@@ -15,3 +15,19 @@ along with this code.  If not, see <http://www.gnu.org/licenses/>.
 Updated by Bruno Vermeulen @2019
 '''
 from ._goompy import GooMPy
+from ._goompy_functions import (set_connection_pool, set_tile_store, set_tile_cache_size,
+                                get_tile_cache_info, use_tile_pack, export_tile_pack,
+                                use_local_pyramid, set_offline)
+from ._tilestore import TileKey, TileStore, SQLiteTileStore, DirectoryTileStore
+from ._tilepack import TilePack
+from ._stats import Stats, get_stats
+from ._prefetcher import Prefetcher
+from ._bulkfetch import prefetch, estimate_prefetch, build_overviews
+from ._server import MapServer
+from ._cachemanager import CacheManager
+from ._overlay import Overlay
+
+try:
+    from ._tkwidget import MapWidget
+except ImportError:  # tkinter is not available
+    pass
@@ -0,0 +1,278 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import os
+import sys
+import json
+import argparse
+import http.client
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from . import _goompy_functions
+from ._ratelimit import _SharedTokenBucket
+from ._stats import _STATS
+from ._goompy_functions import (_EXECUTOR, _TILE_PACKS, _region_keys,
+                                _get_tile_store, _download_shared, _set_rate_limiter,
+                                _derive_tiles, set_tile_store, set_connection_pool,
+                                use_tile_pack)
+
+_CHUNKSIZE = 64  # Number of tiles looked up, downloaded and checkpointed together
+_OVERVIEW_QUALITY = 90
+
+
+def _uncached(keys, store):
+    stored = store.contains_many(keys)
+    return [key for key in keys
+            if key not in stored and not any(key in pack for pack in _TILE_PACKS)]
+
+
+def estimate_prefetch(bbox, zooms, maptypes):
+    '''
+    Returns a dict with the number of tiles of the region bbox = (north, west, south,
+    east) for the zoom levels and map types, the number of tiles that still have to be
+    downloaded, which is the number of requests taken from the quota, and the time
+    the downloads take at the rate limit in seconds
+    '''
+    keys = _region_keys(bbox, zooms, maptypes)
+    store = _get_tile_store()
+    requests = sum(len(_uncached(keys[i:i + _CHUNKSIZE], store))
+                   for i in range(0, len(keys), _CHUNKSIZE))
+    return {'tiles': len(keys), 'requests': requests,
+            'seconds': requests / _goompy_functions._RATE_LIMITER.rate}
+
+
+def _read_checkpoint(checkpoint, region):
+    try:
+        with open(checkpoint) as jsonfile:
+            state = json.load(jsonfile)
+
+    except FileNotFoundError:
+        return 0
+
+    # a checkpoint of another region is started over
+    if state.get('region') != region:
+        return 0
+
+    return state['done']
+
+
+def _write_checkpoint(checkpoint, region, done):
+    temppath = checkpoint + '.tmp'
+    with open(temppath, 'w') as jsonfile:
+        json.dump({'region': region, 'done': done}, jsonfile)
+
+    os.replace(temppath, checkpoint)
+
+
+def _fetch_chunk(keys):
+    '''
+    Downloads the tiles in keys that are not yet cached into the tile store, returns the
+    number of downloaded and failed tiles
+    '''
+    store = _get_tile_store()
+    # the downloads are shared with those of the views, which find the downloaded tiles
+    # in the tiles cache before the batch is stored
+    futures = {_EXECUTOR.submit(_download_shared, key): key
+               for key in _uncached(keys, store)}
+    tiles = {}
+    failed = 0
+    try:
+        for future in as_completed(futures):
+            try:
+                tile, owner = future.result()
+                if owner:
+                    tiles[futures[future]] = tile.data
+
+            except (OSError, http.client.HTTPException):
+                # failed tiles are downloaded again when the tile is needed
+                failed += 1
+
+    finally:
+        for future in futures:
+            future.cancel()
+
+        if tiles:
+            store.put_many(tiles)
+
+    return len(tiles), failed
+
+
+def _init_worker(store, rate_limiter, base_url, pool_size, max_requests, pack_paths):
+    ''' sets up a prefetch worker process to share the store, rate limit and packs '''
+    set_tile_store(store)
+    _set_rate_limiter(rate_limiter)
+    set_connection_pool(base_url, pool_size, max_requests)
+    for path in pack_paths:
+        use_tile_pack(path)
+
+
+def prefetch(bbox, zooms, maptypes, checkpoint=None, progress=None, processes=None):
+    '''
+    Downloads the tiles of the region bbox = (north, west, south, east) for the zoom
+    levels and map types into the tile store, so that the region can be used offline.
+    Tiles that are already cached are skipped, the others are downloaded concurrently
+    under the rate limit. With processes, the batches of tiles are shared out over that
+    many worker processes, the rate limit holds for all workers together.
+
+    With checkpoint, the progress is saved in that JSON file after every batch of
+    tiles and an interrupted prefetch of the same region resumes where it stopped, or
+    at the first batch with failed tiles, so that a rerun downloads these tiles again.
+    progress is called as progress(done, total, downloaded, failed) after every batch.
+    Returns a dict with the number of tiles, downloaded and failed tiles.
+    '''
+    keys = _region_keys(bbox, zooms, maptypes)
+    region = {'bbox': list(bbox), 'zooms': list(zooms), 'maptypes': list(maptypes)}
+    start = _read_checkpoint(checkpoint, region) if checkpoint else 0
+    chunks = [keys[i:i + _CHUNKSIZE] for i in range(start, len(keys), _CHUNKSIZE)]
+
+    executor = None
+    if processes:
+        # the rate limiter and connection pool are replaced by set_connection_pool
+        limiter = _goompy_functions._RATE_LIMITER
+        pool = _goompy_functions._POOL
+        # forked workers would share the sqlite connection and the thread pools of this
+        # process, spawned workers open their own
+        context = multiprocessing.get_context('spawn')
+        executor = ProcessPoolExecutor(
+            processes, mp_context=context, initializer=_init_worker,
+            initargs=(_get_tile_store(),
+                      _SharedTokenBucket(limiter.rate, limiter.burst, context),
+                      pool.base_url, pool.maxsize, pool.max_requests,
+                      [pack.path for pack in _TILE_PACKS]))
+        results = executor.map(_fetch_chunk, chunks)
+
+    else:
+        results = map(_fetch_chunk, chunks)
+
+    # the results come in the order of the batches, so all batches up to done are done
+    downloaded = failed = 0
+    done = resume = start
+    try:
+        for chunk, (chunk_downloaded, chunk_failed) in zip(chunks, results):
+            downloaded += chunk_downloaded
+            failed += chunk_failed
+            done += len(chunk)
+            if not failed:
+                resume = done
+
+            if checkpoint:
+                _write_checkpoint(checkpoint, region, resume)
+
+            if progress:
+                progress(done, len(keys), downloaded, failed)
+
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    return {'tiles': len(keys), 'downloaded': downloaded, 'failed': failed}
+
+
+def _encode_jpeg(image):
+    imagefile = BytesIO()
+    with _STATS.timer('encode'):
+        image.save(imagefile, format='JPEG', quality=_OVERVIEW_QUALITY)
+
+    return imagefile.getvalue()
+
+
+def build_overviews(bbox, zooms, maptypes):
+    '''
+    Composes the tiles of the region bbox = (north, west, south, east) for the zoom
+    levels and map types from the four tiles at the next zoom level in the tile store
+    and adds them to the tile store, so that lower zoom levels of a prefetched region
+    take no requests. The zoom levels are built from the highest down, so that each
+    level can be built from the one built before it. Tiles already in the tile store
+    and tiles whose next zoom level is incomplete are skipped. Returns the number of
+    built tiles.
+    '''
+    store = _get_tile_store()
+    built = 0
+    for zoom in sorted(zooms, reverse=True):
+        keys = _region_keys(bbox, [zoom], maptypes)
+        for i in range(0, len(keys), _CHUNKSIZE):
+            chunk = keys[i:i + _CHUNKSIZE]
+            tiles = _derive_tiles(_uncached(chunk, store))
+            if tiles:
+                store.put_many({key: _encode_jpeg(tile.image)
+                                for key, tile in tiles.items()})
+                built += len(tiles)
+
+    return built
+
+
+def _zoom_levels(text):
+    ''' parses zoom levels given as 12, 10-14 or 10,12,14 '''
+    zooms = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        zooms += range(int(first), int(last or first) + 1)
+
+    return zooms
+
+
+def _print_progress(done, total, downloaded, failed):
+    print(f'\r{done}/{total} tiles, {downloaded} downloaded, {failed} failed',
+          end='' if done < total else '\n', flush=True)
+
+
+def main(argv=None):
+    ''' command line tool to prefetch the tiles of a region '''
+    parser = argparse.ArgumentParser(
+        prog='goompy-prefetch', description='Downloads the map tiles of a region.')
+    parser.add_argument('north', type=float)
+    parser.add_argument('west', type=float)
+    parser.add_argument('south', type=float)
+    parser.add_argument('east', type=float)
+    parser.add_argument('-z', '--zooms', type=_zoom_levels, required=True,
+                        help='zoom levels, like 12, 10-14 or 10,12,14')
+    parser.add_argument('-m', '--maptypes', nargs='+', default=['roadmap'],
+                        help='map types, default roadmap')
+    parser.add_argument('-c', '--checkpoint', help='file to resume an interrupted prefetch')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='number of worker processes to share the downloads')
+    parser.add_argument('--max-requests', type=int,
+                        help='stop before starting when more tiles must be downloaded')
+    parser.add_argument('-o', '--overviews', type=_zoom_levels,
+                        help='zoom levels to build from the prefetched tiles afterwards')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='only show the estimate')
+    args = parser.parse_args(argv)
+
+    bbox = args.north, args.west, args.south, args.east
+    estimate = estimate_prefetch(bbox, args.zooms, args.maptypes)
+    print(f"{estimate['tiles']} tiles, {estimate['requests']} to download, "
+          f"about {estimate['seconds'] / 60:0.1f} minutes")
+
+    if args.dry_run:
+        return 0
+
+    if args.max_requests is not None and estimate['requests'] > args.max_requests:
+        print(f'more than {args.max_requests} requests, not started', file=sys.stderr)
+        return 1
+
+    result = prefetch(bbox, args.zooms, args.maptypes, checkpoint=args.checkpoint,
+                      progress=_print_progress, processes=args.processes)
+    if args.overviews:
+        built = build_overviews(bbox, args.overviews, args.maptypes)
+        print(f'{built} overview tiles built')
+
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
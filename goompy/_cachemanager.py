@@ -0,0 +1,128 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import threading
+from ._tilestore import SQLiteTileStore
+from ._goompy_functions import _MAPSCACHE_PATH, _TILESTORE_FILE, _get_tile_store
+
+_LOGGER = logging.getLogger('goompy')
+_UNITS = {'K': 2**10, 'M': 2**20, 'G': 2**30}
+
+
+class CacheManager(object):
+    '''
+    Holds a SQLiteTileStore, by default the tile store in use, to a quota of max_bytes
+    of tiles by evicting the least recently used tiles in the background every interval
+    seconds. ttl is a dict {maptype: seconds}, tiles older than the ttl of their map
+    type are refreshed when needed and deleted in the background.
+    '''
+    def __init__(self, store=None, max_bytes=None, ttl=None, interval=60):
+        self.store = store or _get_tile_store()
+        if not isinstance(self.store, SQLiteTileStore):
+            raise TypeError('a CacheManager needs a SQLiteTileStore')
+
+        self.max_bytes = max_bytes
+        self.store.ttl = dict(ttl or {})
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+
+            except sqlite3.Error:
+                _LOGGER.exception('cleaning up the tile store failed')
+
+            if self._stopped.wait(self.interval):
+                return
+
+    def run_once(self):
+        ''' deletes the expired tiles and evicts tiles over the quota, returns the counts '''
+        expired = self.store.delete_expired()
+        evicted = self.store.evict(self.max_bytes) if self.max_bytes is not None else 0
+        if expired or evicted:
+            _LOGGER.info('tile store: %d tiles expired, %d tiles evicted', expired, evicted)
+
+        return {'expired': expired, 'evicted': evicted}
+
+
+def _size(text):
+    ''' parses a size in bytes like 500000, 800M or 2G '''
+    unit = _UNITS.get(text[-1:].upper())
+    return int(float(text[:-1]) * unit) if unit else int(text)
+
+
+def _ttl(text):
+    ''' parses a ttl like satellite=30 in days '''
+    maptype, _, days = text.partition('=')
+    return maptype, float(days) * 86400
+
+
+def main(argv=None):
+    ''' command line tool to manage the tile store '''
+    parser = argparse.ArgumentParser(prog='goompy-cache',
+                                     description='Manages the cache of map tiles.')
+    parser.add_argument('--path', default=os.path.join(_MAPSCACHE_PATH, _TILESTORE_FILE),
+                        help='tile store file, default the store in the mapscache folder')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('info', help='shows the number of tiles and bytes per map type')
+    commands.add_parser('verify', help='deletes corrupt tiles and compacts the store')
+    clean = commands.add_parser('clean', help='deletes expired tiles and evicts tiles')
+    clean.add_argument('--max-bytes', type=_size, help='quota like 800M or 2G')
+    clean.add_argument('--ttl', type=_ttl, action='append', default=[],
+                       help='maximum age in days of a map type like satellite=30')
+    args = parser.parse_args(argv)
+
+    store = SQLiteTileStore(args.path)
+    try:
+        if args.command == 'info':
+            for maptype, info in sorted(store.info().items()):
+                print(f"{maptype:10} {info['tiles']:10} tiles {info['nbytes']:14} bytes")
+
+        elif args.command == 'verify':
+            print(f'{store.verify()} corrupt tiles deleted')
+
+        else:
+            result = CacheManager(store, args.max_bytes, dict(args.ttl)).run_once()
+            print(f"{result['expired']} tiles expired, {result['evicted']} tiles evicted")
+
+    finally:
+        store.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
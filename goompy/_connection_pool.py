@@ -0,0 +1,126 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import queue
+import threading
+import http.client
+import urllib.error
+from urllib.parse import urlsplit
+
+# errors raised when the server has closed an idle keep-alive connection
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected, http.client.BadStatusLine,
+    BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+class _ConnectionPool(object):
+    '''
+    Thread safe pool of persistent HTTP/1.1 connections to a single server given by
+    base_url. At most maxsize connections are open at the same time and a connection is
+    closed after it has served max_requests requests.
+    '''
+    def __init__(self, base_url, maxsize=8, max_requests=100, timeout=30):
+        url = urlsplit(base_url)
+        if url.scheme == 'https':
+            self._connection_class = http.client.HTTPSConnection
+
+        elif url.scheme == 'http':
+            self._connection_class = http.client.HTTPConnection
+
+        else:
+            raise ValueError(f'unsupported url scheme: {url.scheme}')
+
+        self.base_url = base_url
+        self.maxsize = maxsize
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self._host = url.hostname
+        self._port = url.port
+        self._path = url.path or '/'
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(maxsize)
+
+    def _new_connection(self):
+        connection = self._connection_class(self._host, self._port, timeout=self.timeout)
+        connection.nrequests = 0
+        return connection
+
+    def _get_connection(self):
+        try:
+            return self._idle.get_nowait()
+
+        except queue.Empty:
+            return self._new_connection()
+
+    def _release_connection(self, connection, response):
+        if response.will_close or connection.nrequests >= self.max_requests:
+            connection.close()
+
+        else:
+            self._idle.put(connection)
+
+    def get(self, query):
+        '''
+        Sends a GET request for base_url with the query string and returns the body of
+        the response as bytes. Raises urllib.error.HTTPError if the response status is
+        not 200.
+        '''
+        path = self._path + '?' + query
+        with self._slots:
+            connection = self._get_connection()
+            try:
+                try:
+                    response = self._request(connection, path)
+
+                except _STALE_CONNECTION_ERRORS:
+                    # nrequests counts the failed request as well
+                    if connection.nrequests == 1:
+                        raise
+
+                    # reused connection was closed by the server, retry on a new one
+                    connection.close()
+                    connection = self._new_connection()
+                    response = self._request(connection, path)
+
+                data = response.read()
+
+            except Exception:
+                connection.close()
+                raise
+
+            self._release_connection(connection, response)
+
+        if response.status != 200:
+            raise urllib.error.HTTPError(
+                self.base_url + '?' + query, response.status, response.reason,
+                response.headers, None)
+
+        return data
+
+    def _request(self, connection, path):
+        connection.nrequests += 1
+        connection.request('GET', path, headers={'Connection': 'keep-alive'})
+        return connection.getresponse()
+
+    def close(self):
+        ''' closes all idle connections '''
+        while True:
+            try:
+                self._idle.get_nowait().close()
+
+            except queue.Empty:
+                break
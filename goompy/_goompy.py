@@ -14,21 +14,39 @@ along with this code.  If not, see <http://www.gnu.org/licenses/>.
 
 Updated by Bruno Vermeulen @2019
 '''
-from ._goompy_functions import (_TILESIZE, _new_image, _fetch_tiles,
-                                _find_largest_zoom_to_fit_one_tile,
-                                _x_to_lon, _y_to_lat, _lon_to_x, _lat_to_y)
+import asyncio
+import threading
+import numpy as np
+from ._goompy_functions import (_TILESIZE, _new_image, _fetch_tiles, _fetch_tiles_async,
+                                _preview_tiles, _zoom_preview, _grab_tiles, _warm_tiles,
+                                _write_snapshot, _read_snapshot, _layer_key, _new_layer,
+                                _fill_mosaic, _LAYER_CACHE_BYTES,
+                                _extend_mosaic, _find_largest_zoom_to_fit_one_tile,
+                                _x_to_lon, _y_to_lat, _lon_to_x, _lat_to_y,
+                                _x_to_lon_array, _y_to_lat_array, _lon_to_x_array,
+                                _lat_to_y_array)
+from ._tilecache import _TileCache
+from ._stats import _STATS
 
 
 class GooMPy(object):
 
     def __init__(self, width, height, latitude, longitude,
-                 zoom, radius_meters=None, default_ntiles=3):
+                 zoom, radius_meters=None, default_ntiles=3, prefetcher=None,
+                 on_update=None, layer_cache_bytes=_LAYER_CACHE_BYTES, fill_maptypes=()):
         '''
         Creates a GooMPy object for specified display width and height at the specified
         coordinates, zoom level (0-22), and map type ('roadmap', 'terrain', 'satellite',
         or 'hybrid'). The value of radius_meters deteremines the number of tiles that will
         be used to create the map image; if it is unspecified, the number defaults to
-        default_ntiles.
+        default_ntiles. An optional Prefetcher loads the tiles ahead of the moves of the
+        view in the background. The optional callback on_update() is called from a
+        background thread when tiles arriving in the background have updated the image.
+
+        The mosaics of the map types used at the current view are kept up to
+        layer_cache_bytes, so that switching back to a map type only swaps the mosaic.
+        The map types in fill_maptypes are loaded at the current view in the background,
+        one tile at a time, so that switching to them is instant as well.
         '''
         self.lat = latitude
         self.lon = longitude
@@ -38,26 +56,90 @@ class GooMPy(object):
         self.height = height
         self.radius_meters = radius_meters
         self.default_ntiles = default_ntiles
+        self.prefetcher = prefetcher
+        self.on_update = on_update
+        self.fill_maptypes = fill_maptypes
 
         self.winimage = _new_image(self.width, self.height)
 
-        self.bigimage = None
+        self.mosaic = None
         self.leftx = None
         self.uppery = None
         self.maptype = None
         self.ntiles = None
+        self._fetch_task = None
+        self._lock = threading.Lock()
+        self._layers = _TileCache(layer_cache_bytes)
+
+    @classmethod
+    def from_snapshot(cls, path, **kwargs):
+        '''
+        Returns a GooMPy object for the view saved by save_snapshot, which shows the saved
+        image at once. Its tiles are taken from the tile caches or downloaded in the
+        background and replace the saved image as they arrive. The keyword arguments are
+        those of GooMPy, the size, center, zoom and map type are those of the snapshot.
+        Raises OSError when path cannot be read and ValueError when it is no snapshot.
+        '''
+        image, view = _read_snapshot(path)
+        goompy = cls(image.size[0], image.size[1], view['latitude'], view['longitude'],
+                     view['zoom'], **kwargs)
+        goompy.maptype = view['maptype']
+        goompy._fetch_preview(image)  # pylint: disable=protected-access
+        goompy._update()  # pylint: disable=protected-access
+        goompy._fill_layers()  # pylint: disable=protected-access
+        return goompy
+
+    def save_snapshot(self, path):
+        '''
+        Saves the current image and view to the PNG file path, so that from_snapshot can
+        show the map right away on the next start
+        '''
+        view = {'latitude': self.get_lat_from_y(self.height / 2),
+                'longitude': self.get_lon_from_x(self.width / 2),
+                'zoom': self.zoom, 'maptype': self.maptype}
+        _write_snapshot(path, self.copy_image(), view)
 
     def use_map_type(self, maptype):
         '''
         Uses the specified map type 'roadmap', 'terrain', 'satellite', or 'hybrid'.
-        Map tiles are fetched as needed.
+        Map tiles are fetched as needed. A map type that was used or loaded in the
+        background at the current view is swapped in without fetching the whole view.
         '''
         self.maptype = maptype
         if self.radius_meters:
             self.zoom = _find_largest_zoom_to_fit_one_tile(self.lat, self.radius_meters)
 
-        self._fetch()
+        layer = None
+        if self.mosaic is not None:
+            self._layers.put(_layer_key(self.mosaic), self.mosaic)
+            if self.mosaic.zoom == self.zoom:
+                layer = self._layers.get(_layer_key(self.mosaic, maptype))
+
+        if layer is None:
+            self._fetch()
+
+        else:
+            self._cancel_fetch()
+            self.mosaic = layer
+            _fill_mosaic(layer, self.leftx, self.uppery, self.width, self.height)
+            if self.prefetcher is not None:
+                self.prefetcher.schedule(self)
+
         self._update()
+        self._fill_layers()
+
+    async def use_map_type_async(self, maptype):
+        '''
+        Awaitable version of use_map_type. The tiles are fetched concurrently on the running
+        event loop and the view is only updated once all tiles have arrived. A newer zoom,
+        move or map type request cancels this request, in which case
+        asyncio.CancelledError is raised.
+        '''
+        zoom = self.zoom
+        if self.radius_meters:
+            zoom = _find_largest_zoom_to_fit_one_tile(self.lat, self.radius_meters)
+
+        await self._fetch_async(self.lat, self.lon, zoom, maptype)
 
     def get_image(self):
         '''
@@ -65,47 +147,193 @@ class GooMPy(object):
         '''
         return self.winimage
 
+    def copy_image(self):
+        '''
+        Returns a copy of the current image, taken while no tiles arriving in the
+        background are being pasted into it
+        '''
+        with self._lock:
+            return self.winimage.copy()
+
     def move(self, dx, dy):
         '''
-        Moves the view by the specified pixels dx, dy.
+        Moves the view by the specified pixels dx, dy. Only the tiles that come
+        into view are fetched.
         '''
-        self.leftx = self._constrain(self.leftx, dx, self.width)
-        self.uppery = self._constrain(self.uppery, dy, self.height)
+        self._cancel_fetch()
+        self.leftx += dx
+        self.uppery += dy
+        _extend_mosaic(self.mosaic, self.leftx, self.uppery, self.width, self.height)
         self._update()
 
-    def use_zoom(self, zoom):
+        if self.prefetcher is not None:
+            self.prefetcher.record_move(self, dx, dy)
+
+    def use_zoom(self, zoom, preview=False):
         '''
         Uses the specified zoom level 0 through 22.
-        Map tiles are fetched as needed and centered around the center point
+        Map tiles are fetched as needed and centered around the center point. With
+        preview, returns immediately with the current image resampled to the new zoom
+        level and the cached tiles, the other tiles are fetched in the background and
+        replace the preview as they arrive.
         '''
         # calculate the new center point lat, lon with the old zoom!
         self.lat = self.get_lat_from_y(self.height / 2)
         self.lon = self.get_lon_from_x(self.width / 2)
 
         # change zoom, fetch new tiles and center
-        self.zoom = zoom
-        self._fetch()
+        if preview:
+            centerx = self.mosaic.originx + self.leftx + self.width / 2
+            centery = self.mosaic.originy + self.uppery + self.height / 2
+            image = _zoom_preview(self.copy_image(), 2 ** (zoom - self.zoom),
+                                  self.maptype, self.zoom, centerx, centery)
+            self.zoom = zoom
+            self._fetch_preview(image)
+
+        else:
+            self.zoom = zoom
+            self._fetch()
+
         self._update()
+        self._fill_layers()
+
+    async def use_zoom_async(self, zoom):
+        '''
+        Awaitable version of use_zoom. The tiles are fetched concurrently on the running
+        event loop and the view is only updated once all tiles have arrived. A newer zoom,
+        move or map type request cancels this request, in which case
+        asyncio.CancelledError is raised.
+        '''
+        latitude = self.get_lat_from_y(self.height / 2)
+        longitude = self.get_lon_from_x(self.width / 2)
+        await self._fetch_async(latitude, longitude, zoom, self.maptype)
 
     @property
     def get_zoom(self):
         return self.zoom
 
     def _fetch(self):
-        self.bigimage, self.ntiles, self.northwest, self.southeast = _fetch_tiles(
+        self._cancel_fetch()
+        *view, other_keys = _fetch_tiles(
             self.lat, self.lon, self.zoom, self.maptype,
-            self.radius_meters, self.default_ntiles)
+            self.radius_meters, self.default_ntiles, self.width, self.height)
+        self._use_tiles(*view)
+        self._warm(other_keys)
+
+    def _fetch_preview(self, preview):
+        self._cancel_fetch()
+        *view, pending, other_keys = _preview_tiles(
+            self.lat, self.lon, self.zoom, self.maptype, self.radius_meters,
+            self.default_ntiles, preview)
+        self._use_tiles(*view)
+
+        threading.Thread(target=self._refine, args=(self.mosaic, pending, other_keys),
+                         daemon=True).start()
+
+    def _warm(self, keys):
+        # loads the rest of the big image in the background, until the view changes
+        if keys:
+            mosaic = self.mosaic
+            threading.Thread(target=_warm_tiles,
+                             args=(keys, lambda: self.mosaic is mosaic),
+                             daemon=True).start()
+
+    def _refine(self, mosaic, keys, other_keys):
+        # replaces the preview by the tiles as they arrive, until the view changes; the
+        # preview stays where a tile failed until a move fetches it again
+        tiles = _grab_tiles(keys, skip_failed=True)
+        try:
+            for key, tile in tiles:
+                if self.mosaic is not mosaic:
+                    break
 
-        halfsize = int(self.bigimage.size[0] / 2)
+                # tiles outside the mosaic are only loaded into the tile caches
+                if mosaic.paste(key, tile):
+                    self._update()
+                    if self.on_update is not None:
+                        self.on_update()
+
+        finally:
+            tiles.close()
+            mosaic.release(keys)
+
+        _warm_tiles(other_keys, lambda: self.mosaic is mosaic)
+
+    async def _fetch_async(self, latitude, longitude, zoom, maptype):
+        # the view is left untouched until all tiles have arrived, so that a superseded
+        # request does not leave the view in a mixed state
+        self._cancel_fetch()
+        task = asyncio.ensure_future(_fetch_tiles_async(
+            latitude, longitude, zoom, maptype, self.radius_meters, self.default_ntiles,
+            self.width, self.height))
+        self._fetch_task = task
+        result = await task
+
+        # the task may have completed just before it was superseded
+        if self._fetch_task is not task:
+            raise asyncio.CancelledError()
+
+        self._fetch_task = None
+        self.lat = latitude
+        self.lon = longitude
+        self.zoom = zoom
+        self.maptype = maptype
+        *view, other_keys = result
+        self._use_tiles(*view)
+        self._warm(other_keys)
+        self._update()
+
+    def _fill_layers(self):
+        if self.fill_maptypes:
+            threading.Thread(target=self._load_layers, args=(self.mosaic,),
+                             daemon=True).start()
+
+    def _load_layers(self, mosaic):
+        # loads the other map types one tile at a time below the priority of the view,
+        # until the view changes
+        view = _layer_key(mosaic)[1:]
+
+        def active():
+            return _layer_key(self.mosaic)[1:] == view
+
+        for maptype in self.fill_maptypes:
+            if not active():
+                return
+
+            if maptype == mosaic.maptype or (maptype,) + view in self._layers:
+                continue
+
+            # a switch to the map type before it is loaded fetches only its missing tiles,
+            # a missing tile is fetched when the map type is used
+            layer, keys = _new_layer(mosaic, maptype, self.leftx, self.uppery,
+                                     self.width, self.height)
+            self._layers.put(_layer_key(layer), layer)
+            _warm_tiles(keys, active, layer)
+
+            # the size of the layer is counted when it is put
+            self._layers.put(_layer_key(layer), layer)
+
+    def _cancel_fetch(self):
+        if self._fetch_task is not None:
+            self._fetch_task.cancel()
+            self._fetch_task = None
+
+    def _use_tiles(self, mosaic, ntiles, northwest, southeast):
+        self.mosaic = mosaic
+        self.ntiles = ntiles
+        self.northwest = northwest
+        self.southeast = southeast
+
+        halfsize = int(self.ntiles * _TILESIZE / 2)
         self.leftx = halfsize - self.width / 2
         self.uppery = halfsize - self.height / 2
 
-    def _update(self):
-        self.winimage.paste(self.bigimage, (-int(self.leftx), -int(self.uppery)))
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(self)
 
-    def _constrain(self, oldval, diff, dimsize):
-        newval = oldval + diff
-        return newval if 0 <= newval <= self.bigimage.size[0] - dimsize else oldval
+    def _update(self):
+        with _STATS.timer('update'), self._lock:
+            self.mosaic.compose(self.winimage, self.leftx, self.uppery)
 
     def get_lon_from_x(self, x):
         x += self.leftx
@@ -126,3 +354,26 @@ class GooMPy(object):
 
     def get_ywin_from_lat(self, lat):
         return _lat_to_y(lat, self.lat, self.ntiles, self.zoom) - self.uppery
+
+    # The array versions below convert numpy arrays (or sequences) of coordinates in
+    # one vectorized pass and return numpy arrays
+
+    def get_lon_from_x_array(self, x):
+        x = np.asarray(x, dtype=float) + self.leftx
+        return _x_to_lon_array(x - 0.5 * self.ntiles * _TILESIZE, self.lon, self.zoom)
+
+    def get_lat_from_y_array(self, y):
+        y = np.asarray(y, dtype=float) + self.uppery
+        return _y_to_lat_array(y - 0.5 * self.ntiles * _TILESIZE, self.lat, self.zoom)
+
+    def get_x_from_lon_array(self, lon):
+        return _lon_to_x_array(lon, self.lon, self.ntiles, self.zoom)
+
+    def get_y_from_lat_array(self, lat):
+        return _lat_to_y_array(lat, self.lat, self.ntiles, self.zoom)
+
+    def get_xwin_from_lon_array(self, lon):
+        return _lon_to_x_array(lon, self.lon, self.ntiles, self.zoom) - self.leftx
+
+    def get_ywin_from_lat_array(self, lat):
+        return _lat_to_y_array(lat, self.lat, self.ntiles, self.zoom) - self.uppery
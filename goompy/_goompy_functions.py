@@ -18,28 +18,60 @@ Updated by Bruno Vermeulen @2019
 '''
 import os
 import time
+import json
 import math as m
-from io import BytesIO
-import urllib.request
+import logging
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import PIL.Image
-
-try:
-    from .key import _KEY
-
-except:  # pylint: disable=bare-except
-    print('google api key required')
-    exit()
-
-urlopen = urllib.request.urlopen
+import PIL.PngImagePlugin
+from ._ratelimit import _TokenBucket
+from ._connection_pool import _ConnectionPool
+from ._projection import _lon_to_worldx, _lat_to_worldy
+from ._tilestore import SQLiteTileStore
+from ._tilecache import _TileCache, _Tile
+from ._tilepack import TilePack, _write_tile_pack
+from ._singleflight import _SingleFlight
+from ._pyramid import _child_keys, _compose_parent
+from ._stats import _STATS
+from ._mosaic import _TileMosaic, _grid_keys
 
 _EARTHPIX = 268435456  # Number of pixels in half the earth's circumference at zoom = 21
 _DEGREE_PRECISION = 4  # Number of decimal places for rounding coordinates
 _TILESIZE = 640        # Larget tile we can grab without paying (was 640)
 _GRABRATE = 4          # Fastest rate at which we can download tiles without paying
-_MAPSCACHE_PATH = 'd:/temp/mapscache/'
+_GRABBURST = 8         # Number of tiles that can be downloaded in a burst above _GRABRATE
+_MAX_WORKERS = 8       # Maximum number of concurrent tile downloads
+_MAX_REQUESTS = 100    # Maximum number of requests on one keep-alive connection
+_STATICMAPS_URL = 'https://maps.googleapis.com/maps/api/staticmap'
+_MAPSCACHE_PATH = os.path.join(os.path.expanduser('~'), '.goompy', 'mapscache')
+_TILESTORE_FILE = 'tiles.mbtiles'
+_TILECACHE_BYTES = 256 * 2**20  # Memory budget of the decoded tiles cache
+_MIN_OVERVIEW_SCALE = 1 / 4     # Smallest scale at which cached tiles fill a zoom preview
+_SNAPSHOT_KEY = 'goompy'        # Name of the text chunk with the view in a snapshot
+_EXPORT_CHUNKSIZE = 64          # Number of tiles looked up together for a tile pack
+_LAYER_CACHE_BYTES = 64 * 2**20  # Memory budget of the mosaics kept per map type
 
 _pixrad = _EARTHPIX / m.pi
 
+# process wide limiter and worker pool, shared by all GooMPy instances
+_RATE_LIMITER = _TokenBucket(_GRABRATE, _GRABBURST)
+_EXECUTOR = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix='goompy')
+_POOL = _ConnectionPool(_STATICMAPS_URL, _MAX_WORKERS, _MAX_REQUESTS)
+_TILE_CACHE = _TileCache(_TILECACHE_BYTES)
+
+# tile store is opened on first use, see _get_tile_store
+_TILE_STORE = None
+_TILE_STORE_LOCK = threading.Lock()
+_TILE_PACKS = []
+_DOWNLOADS = _SingleFlight()
+_LOCAL_PYRAMID = False
+_OFFLINE = False
+_API_KEY = None
+_LOGGER = logging.getLogger('goompy')
+
 
 def _new_image(width, height):
     return PIL.Image.new('RGB', (width, height))
@@ -54,36 +86,378 @@ def _zoom_factor(zoom):
     return 2 ** (21 - zoom)
 
 
-def _grab_tile(lat, lon, zoom, maptype, _TILESIZE, sleeptime):
-    urlbase = 'https://maps.googleapis.com/maps/api/staticmap?center=%f,%f&zoom=%d&maptype=%s&size=%dx%d&format=jpg'  # pylint: disable=line-too-long
-    urlbase += '&key=' + _KEY
+def set_connection_pool(base_url=_STATICMAPS_URL, pool_size=_MAX_WORKERS,
+                        max_requests=_MAX_REQUESTS):
+    '''
+    Replaces the pool of keep-alive connections used to download the tiles. base_url is
+    the url of the static maps api, which can point to a local stand-in server for
+    testing, pool_size the maximum number of open connections and max_requests the
+    number of requests after which a connection is renewed.
+    '''
+    global _POOL  # pylint: disable=global-statement
+    old_pool = _POOL
+    _POOL = _ConnectionPool(base_url, pool_size, max_requests)
+    old_pool.close()
+
+
+def _set_rate_limiter(rate_limiter):
+    ''' replaces the rate limiter of the tile downloads '''
+    global _RATE_LIMITER  # pylint: disable=global-statement
+    _RATE_LIMITER = rate_limiter
 
-    specs = lat, lon, zoom, maptype, _TILESIZE, _TILESIZE
 
-    filename = _MAPSCACHE_PATH + ('%f_%f_%d_%s_%d_%d' % specs) + '.jpg'
+def set_tile_store(store):
+    '''
+    Replaces the store in which the tiles are cached, store is a TileStore like
+    SQLiteTileStore or the legacy DirectoryTileStore. By default the tiles are cached
+    in a SQLiteTileStore in the mapscache folder.
+    '''
+    global _TILE_STORE  # pylint: disable=global-statement
+    with _TILE_STORE_LOCK:
+        _TILE_STORE = store
 
-    tile = None
 
-    if os.path.isfile(filename):
-        tile = PIL.Image.open(filename)
+def set_offline(enabled=True):
+    '''
+    Offline, the tiles are only taken from the tile packs, the tiles cache, the tile
+    store and the local pyramid, tiles that are not cached are left blank. Nothing is
+    downloaded, so no google api key is needed.
+    '''
+    global _OFFLINE  # pylint: disable=global-statement
+    _OFFLINE = enabled
 
-    else:
-        url = urlbase % specs
 
-        result = urlopen(url).read()
-        tile = PIL.Image.open(BytesIO(result))
+def _api_key():
+    '''
+    Returns the google api key, which is read from GOOGLE_API_KEY in the environment or
+    a .env file on the first download
+    '''
+    global _API_KEY  # pylint: disable=global-statement
+    if _API_KEY is None:
+        from .key import _read_key  # pylint: disable=import-outside-toplevel
+        _API_KEY = _read_key()
+        if _API_KEY is None:
+            raise RuntimeError('google api key required, set GOOGLE_API_KEY or use '
+                               'goompy.set_offline() for cached tiles only')
+
+    return _API_KEY
+
+
+def set_tile_cache_size(max_bytes):
+    '''
+    Sets the memory budget in bytes of the cache of decoded tiles that is shared by all
+    GooMPy instances
+    '''
+    _TILE_CACHE.resize(max_bytes)
+
+
+def get_tile_cache_info():
+    '''
+    Returns a dict with the number of tiles, memory used and hit/ miss counters of the
+    cache of decoded tiles
+    '''
+    return _TILE_CACHE.info()
+
+
+def use_tile_pack(path):
+    '''
+    Uses the tile pack at path, made by export_tile_pack. Tiles in the pack are taken
+    from the pack before the tile store is looked at. Returns the TilePack.
+    '''
+    pack = TilePack(path)
+    _TILE_PACKS.append(pack)
+    return pack
+
+
+def export_tile_pack(path, bbox, zooms, maptypes):
+    '''
+    Writes the tiles of the region bbox = (north, west, south, east) for the zoom levels
+    and map types to a tile pack at path, see use_tile_pack. Tiles that are not yet
+    cached are downloaded first. Returns the number of tiles in the pack.
+    '''
+    keys = _region_keys(bbox, zooms, maptypes)
+    _write_tile_pack(path, keys, _region_images(keys), _TILESIZE)
+    return len(keys)
+
+
+def _region_images(keys):
+    ''' yields (key, image) for the keys, fetched in batches of _EXPORT_CHUNKSIZE '''
+    for i in range(0, len(keys), _EXPORT_CHUNKSIZE):
+        for key, tile in _grab_tiles(keys[i:i + _EXPORT_CHUNKSIZE]):
+            yield key, tile.image
+
+
+def _region_keys(bbox, zooms, maptypes):
+    ''' returns the keys of the tiles that cover bbox = (north, west, south, east) '''
+    north, west, south, east = bbox
+    keys = []
+    for maptype in maptypes:
+        for zoom in zooms:
+            left, right = _lon_to_worldx(west, zoom), _lon_to_worldx(east, zoom)
+            upper, lower = _lat_to_worldy(north, zoom), _lat_to_worldy(south, zoom)
+            keys += _grid_keys(maptype, zoom, left, upper, right - left, lower - upper,
+                               _TILESIZE)
+
+    return keys
+
+
+def use_local_pyramid(enabled=True):
+    '''
+    With the local pyramid enabled, tiles that are not cached are composed from their
+    four cached tiles at the next zoom level instead of being downloaded, so zooming out
+    over a cached region needs no network. These tiles are downsampled, so labels are
+    smaller than on downloaded tiles. Zoom previews always use the local pyramid.
+    '''
+    global _LOCAL_PYRAMID  # pylint: disable=global-statement
+    _LOCAL_PYRAMID = enabled
+
+
+def _derive_tiles(keys, cached_only=False):
+    '''
+    Returns a dict {key: tile} of the tiles in keys whose four tiles at the next zoom
+    level are in the tile packs or tiles cache or, unless cached_only, the tile store,
+    composed from those tiles
+    '''
+    children = {key: _child_keys(key, _TILESIZE) for key in keys if key.zoom < 21}
+    child_keys = [child for quadrants in children.values() for child in quadrants]
+    found = _cached_tiles(child_keys)
+    if not cached_only and child_keys:
+        stored = _read_store(_get_tile_store(), [key for key in child_keys
+                                                 if key not in found])
+        found.update((key, _Tile(data)) for key, data in stored.items())
+
+    tiles = {}
+    with _STATS.timer('derive'):
+        for key, quadrants in children.items():
+            if all(child in found for child in quadrants):
+                tiles[key] = _Tile(image=_compose_parent(
+                    [found[child] for child in quadrants], _TILESIZE))
+
+    return tiles
+
+
+def _pack_tile(key):
+    '''
+    Returns the tile for key from the tile packs in use or None, its image is mapped
+    onto the pack
+    '''
+    for pack in _TILE_PACKS:
+        image = pack.get(key)
+        if image is not None:
+            return _Tile(image=image)
+
+    return None
+
+
+def _get_tile_store():
+    global _TILE_STORE  # pylint: disable=global-statement
+    with _TILE_STORE_LOCK:
+        if _TILE_STORE is None:
+            _TILE_STORE = SQLiteTileStore(os.path.join(_MAPSCACHE_PATH, _TILESTORE_FILE))
+
+        return _TILE_STORE
+
+
+def _download_tile(key):
+    '''
+    Downloads the tile for key from the static maps api, returns the original bytes of
+    the response
+    '''
+    querybase = 'center=%f,%f&zoom=%d&maptype=%s&size=%dx%d&format=jpg'
+    querybase += '&key=' + _api_key()
+
+    lat, lon = key.latlon
+    query = querybase % (lat, lon, key.zoom, key.maptype, _TILESIZE, _TILESIZE)
+
+    # Choke back speed to avoid maxing out limit
+    _STATS.count('rate_limit_wait', _RATE_LIMITER.acquire())
+    with _STATS.timer('download'):
+        data = _POOL.get(query)
+
+    _STATS.count('downloads')
+    _STATS.count('bytes_downloaded', len(data))
+    return data
+
+
+def _download_to_cache(key):
+    '''
+    Downloads the tile for key into the tiles cache and returns (tile, downloaded). A
+    tile stored by the previous download of the key is taken from the tiles cache.
+    '''
+    tile = _TILE_CACHE.get(key)
+    if tile is not None:
+        return tile, False
+
+    tile = _Tile(_download_tile(key))
+    _TILE_CACHE.put(key, tile)
+    return tile, True
+
+
+def _download_shared(key):
+    '''
+    Downloads the tile for key into the tiles cache and returns (tile, owner). A download
+    of the tile by another caller that is in flight is waited for, and a tile that was
+    downloaded meanwhile is taken from the tiles cache. owner is False in these cases,
+    as the tile is stored by the other caller.
+    '''
+    if key in _TILE_CACHE:
+        tile = _TILE_CACHE.get(key)
+        if tile is not None:
+            return tile, False
+
+    # the download may have finished between the look in the cache and the flight
+    (tile, downloaded), owner = _DOWNLOADS.do(key, _download_to_cache, key)
+    return tile, owner and downloaded
+
+
+def _cached_tiles(keys):
+    '''
+    Returns a dict {key: tile} of the tiles in keys found in the cache or packs, the
+    tiles from the packs are mapped and not added to the cache
+    '''
+    tiles = {}
+    for key in keys:
+        tile = _TILE_CACHE.get(key)
+        if tile is not None:
+            _STATS.count('cache_hits')
+
+        else:
+            tile = _pack_tile(key)
+            _STATS.count('cache_misses' if tile is None else 'pack_hits')
+
+        if tile is not None:
+            tiles[key] = tile
+
+    return tiles
+
+
+def _read_store(store, keys):
+    ''' returns a dict {key: data} of the tiles in keys found in store '''
+    with _STATS.timer('store_read'):
+        stored = store.get_many(keys)
+
+    _STATS.count('store_hits', len(stored))
+    _STATS.count('store_misses', len(keys) - len(stored))
+    return stored
+
+
+def _write_store(store, tiles):
+    with _STATS.timer('store_write'):
+        store.put_many(tiles)
+
+
+def _grab_tiles(keys, skip_failed=False):
+    '''
+    Generator that yields (key, tile) for the tile keys as the tiles become available.
+    Tiles are taken from the tile packs and the tiles cache, the other tiles are looked
+    up in the tile store in one batch, the remaining tiles are downloaded concurrently
+    and added unchanged to the tile store in one batch. With the local pyramid, tiles
+    are composed from the cached tiles at the next zoom level before any is downloaded.
+    Offline, nothing is downloaded. The tiles are only decoded when their image is used.
+    A failed download raises, or with skip_failed is logged and its tile left out.
+    '''
+    cached = _cached_tiles(keys)
+    yield from cached.items()
+
+    keys = [key for key in keys if key not in cached]
+    store = _get_tile_store()
+    stored = _read_store(store, keys)
+    for key, data in stored.items():
+        tile = _Tile(data)
+        _TILE_CACHE.put(key, tile)
+        yield key, tile
+
+    keys = [key for key in keys if key not in stored]
+    if _LOCAL_PYRAMID:
+        derived = _derive_tiles(keys)
+        for key, tile in derived.items():
+            _TILE_CACHE.put(key, tile)
+            yield key, tile
+
+        keys = [key for key in keys if key not in derived]
+
+    if _OFFLINE:
+        return
+
+    futures = {_EXECUTOR.submit(_download_shared, key): key for key in keys}
+
+    downloaded = {}
+    try:
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                tile, owner = future.result()
+
+            except Exception:  # pylint: disable=broad-except
+                if not skip_failed:
+                    raise
+
+                _LOGGER.warning('tile %s could not be downloaded', key, exc_info=True)
+                continue
+
+            if owner:
+                downloaded[key] = tile.data
+
+            yield key, tile
+
+    finally:
+        for future in futures:
+            future.cancel()
+
+        if downloaded:
+            _write_store(store, downloaded)
+
+
+async def _grab_tiles_async(keys):
+    '''
+    Asynchronous generator version of _grab_tiles, the tile store and the downloads
+    are accessed from the worker pool. When the consumer is cancelled, the downloads
+    that have not yet started are cancelled as well.
+    '''
+    cached = _cached_tiles(keys)
+    for key, tile in cached.items():
+        yield key, tile
+
+    keys = [key for key in keys if key not in cached]
+    loop = asyncio.get_running_loop()
+    store = _get_tile_store()
+    stored = await loop.run_in_executor(_EXECUTOR, _read_store, store, keys)
+    for key, data in stored.items():
+        tile = _Tile(data)
+        _TILE_CACHE.put(key, tile)
+        yield key, tile
 
-        # Some tiles are in mode `RGBA` and need to be converted
-        if tile.mode != 'RGB':
-            tile = tile.convert('RGB')
+    keys = [key for key in keys if key not in stored]
+    if _LOCAL_PYRAMID:
+        derived = await loop.run_in_executor(_EXECUTOR, _derive_tiles, keys)
+        for key, tile in derived.items():
+            _TILE_CACHE.put(key, tile)
+            yield key, tile
 
-        if not os.path.exists(_MAPSCACHE_PATH):
-            os.mkdir(_MAPSCACHE_PATH)
+        keys = [key for key in keys if key not in derived]
 
-        tile.save(filename)
-        time.sleep(sleeptime)  # Choke back speed to avoid maxing out limit
+    if _OFFLINE:
+        return
 
-    return tile
+    async def download(key):
+        return key, await loop.run_in_executor(_EXECUTOR, _download_shared, key)
+
+    tasks = [asyncio.ensure_future(download(key)) for key in keys]
+    downloaded = {}
+    try:
+        for next_tile in asyncio.as_completed(tasks):
+            key, (tile, owner) = await next_tile
+            if owner:
+                downloaded[key] = tile.data
+
+            yield key, tile
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        if downloaded:
+            _write_store(store, downloaded)
 
 
 def _x_to_lon(x, longitude, zoom):
@@ -125,6 +499,47 @@ def _lat_to_y(lat, latitude, ntiles, zoom):
     return round(pix + 0.5 * ntiles * _TILESIZE)
 
 
+def _x_to_lon_array(x, longitude, zoom):
+    ''' converts an array of x (pixels bigimage) to longitudes '''
+    longitude = _roundto(longitude, _DEGREE_PRECISION)
+    lonpix = _EARTHPIX + longitude * m.radians(_pixrad)
+
+    x = np.asarray(x, dtype=float)
+    return np.degrees((lonpix - _EARTHPIX + _zoom_factor(zoom) * x) / _pixrad)
+
+
+def _y_to_lat_array(y, latitude, zoom):
+    ''' converts an array of y (pixels bigimage) to latitudes '''
+    latitude = _roundto(latitude, _DEGREE_PRECISION)
+    sinlat = m.sin(m.radians(latitude))
+    latpix = _EARTHPIX - _pixrad * m.log((1 + sinlat)/(1 - sinlat)) / 2
+
+    y = np.asarray(y, dtype=float)
+    return np.degrees(
+        m.pi/2 - 2 * np.arctan(np.exp((latpix - _EARTHPIX + _zoom_factor(zoom) * y) /
+                                      _pixrad)))
+
+
+def _lon_to_x_array(lon, longitude, ntiles, zoom):
+    ''' converts an array of longitudes to x in pixels bigimage '''
+    lonpix = _EARTHPIX + longitude * m.radians(_pixrad)
+    offset = (_EARTHPIX - lonpix) / _zoom_factor(zoom) + 0.5 * ntiles * _TILESIZE
+
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.rint(lon * (_pixrad / _zoom_factor(zoom)) + offset).astype(np.int64)
+
+
+def _lat_to_y_array(lat, latitude, ntiles, zoom):
+    ''' converts an array of latitudes to y in pixels bigimage '''
+    sinlat = m.sin(m.radians(latitude))
+    latpix = _EARTHPIX - _pixrad * m.log((1 + sinlat)/(1 - sinlat)) / 2
+    offset = (_EARTHPIX - latpix) / _zoom_factor(zoom) + 0.5 * ntiles * _TILESIZE
+
+    lat = np.radians(np.asarray(lat, dtype=float))
+    pix = np.log(np.tan(m.pi / 4 - lat / 2)) * (_pixrad / _zoom_factor(zoom))
+    return np.rint(pix + offset).astype(np.int64)
+
+
 def _pixels_per_meter(latitude, zoom):
     # https://groups.google.com/forum/#!topic/google-maps-js-api-v3/hDRO4oHVSeM
     return 2 ** zoom / (156543.03392 * m.cos(m.radians(latitude)))
@@ -139,51 +554,288 @@ def _find_largest_zoom_to_fit_one_tile(latitude, radius):
     raise ValueError('No zoom found')
 
 
-def _fetch_tiles(
-        latitude, longitude, zoom, maptype, radius_meters, default_ntiles):
+def _new_mosaic(latitude, longitude, zoom, maptype, radius_meters, default_ntiles,
+                width, height):
     '''
-    Fetches tiles from GoogleMaps at the specified coordinates, zoom level (0-22), and map
-    type ('roadmap', 'terrain', 'satellite', or 'hybrid').  The value of radius_meters
-    deteremines the number of tiles that will be fetched; if it is unspecified, the number
-    defaults to default_ntiles.  Tiles are stored as JPEG images in the mapscache folder.
+    Returns the number of tiles ntiles of the ntiles x ntiles tiles big image centered on
+    latitude, longitude and an empty mosaic for it. The tiles of the mosaic are aligned
+    to a global grid of _TILESIZE world pixels at zoom, so that any view at the same zoom
+    reuses the same tiles. The mosaic only holds the tiles around the window of width x
+    height pixels in the center of the big image; also returns the keys of these tiles
+    and the keys of the other tiles of the big image.
     '''
-    latitude = _roundto(latitude, _DEGREE_PRECISION)
-    longitude = _roundto(longitude, _DEGREE_PRECISION)
-
     # number of tiles required to go from center latitude to desired radius in meters
     if radius_meters:
         pix = radius_meters * 2 * _pixels_per_meter(latitude, zoom)
-        print(f'pix: {pix:.0f}')
+        _LOGGER.debug('radius of %s meters is %.0f pixels', radius_meters, pix)
         ntiles = m.ceil(pix / _TILESIZE)
         if ntiles < default_ntiles:
             ntiles = default_ntiles
     else:
         ntiles = default_ntiles
 
+    # world pixel coordinates of the upper left corner of the big image
     bigsize = ntiles * _TILESIZE
-    bigimage = _new_image(bigsize, bigsize)
+    originx = round(_lon_to_worldx(longitude, zoom) - bigsize / 2)
+    originy = round(_lat_to_worldy(latitude, zoom) - bigsize / 2)
+
+    mosaic_ntiles = m.ceil(max(width, height) / _TILESIZE) + 2
+    mosaic = _TileMosaic(maptype, zoom, originx, originy, mosaic_ntiles, _TILESIZE)
+
+    halfsize = int(bigsize / 2)
+    keys = _cover_window(mosaic, halfsize - width / 2, halfsize - height / 2, width, height)
+    other_keys = [key for key in _grid_keys(
+        maptype, zoom, originx, originy, bigsize, bigsize, _TILESIZE) if key not in keys]
+
+    return ntiles, mosaic, keys, other_keys
+
+
+def _cover_window(mosaic, x, y, width, height):
+    '''
+    Covers the window x, y, width, height with a margin of half a tile by the mosaic
+    and returns the keys of the tiles that have become exposed
+    '''
+    margin = _TILESIZE // 2
+    return mosaic.cover(x - margin, y - margin, width + 2 * margin, height + 2 * margin)
+
+
+def _layer_key(mosaic, maptype=None):
+    ''' returns the key of the mosaic of maptype for the same view as mosaic '''
+    return maptype or mosaic.maptype, mosaic.zoom, mosaic.originx, mosaic.originy
+
 
-    for j in range(ntiles):
-        lon = _x_to_lon((j - ntiles / 2 + 0.5) * _TILESIZE, longitude, zoom)
+def _new_layer(mosaic, maptype, x, y, width, height):
+    '''
+    Returns an empty mosaic of maptype for the same view as mosaic and the keys of its
+    tiles around the window x, y, width, height
+    '''
+    layer = _TileMosaic(maptype, mosaic.zoom, mosaic.originx, mosaic.originy,
+                        mosaic.ntiles, _TILESIZE)
+    return layer, _cover_window(layer, x, y, width, height)
+
+
+def _fill_mosaic(mosaic, x, y, width, height):
+    '''
+    Fetches the tiles around the window x, y, width, height that are missing in the
+    mosaic, both those that become exposed and those that had not arrived yet when the
+    mosaic was put aside
+    '''
+    _cover_window(mosaic, x, y, width, height)
+
+    margin = _TILESIZE // 2
+    keys = mosaic.missing(_grid_keys(
+        mosaic.maptype, mosaic.zoom, mosaic.originx + x - margin,
+        mosaic.originy + y - margin, width + 2 * margin, height + 2 * margin, _TILESIZE))
+    for key, tile in _grab_tiles(keys):
+        mosaic.paste(key, tile)
+
+
+def _load_tiles(keys, decode=False):
+    ''' loads the tiles into the tile caches, with decode the tiles are also decoded '''
+    for _, tile in _grab_tiles(keys):
+        if decode:
+            tile.image  # pylint: disable=pointless-statement
+
+
+def _yield_to_views(active):
+    '''
+    Waits while less than half the burst of the rate limiter is left for the views,
+    returns active() when done, the wait stops as soon as active() returns False
+    '''
+    while active() and _RATE_LIMITER.available() < _RATE_LIMITER.burst / 2:
+        time.sleep(1 / _RATE_LIMITER.rate)
 
-        for k in range(ntiles):
-            lat = _y_to_lat((k - ntiles / 2 + 0.5) * _TILESIZE, latitude, zoom)
+    return active()
 
-            tile = _grab_tile(lat, lon, zoom, maptype, _TILESIZE, 1/ _GRABRATE)
-            bigimage.paste(tile, (j * _TILESIZE, k * _TILESIZE))
 
+def _warm_tiles(keys, active, mosaic=None):
+    '''
+    Loads the tiles into the tile caches one at a time below the priority of the views:
+    a tile is only downloaded while half the burst of the rate limiter is left for the
+    views. With mosaic, the tiles are decoded and pasted into the mosaic. Stops as soon
+    as active() returns False.
+    '''
+    for key in keys:
+        cached = key in _TILE_CACHE
+        if cached and mosaic is None:
+            continue
+
+        if not (active() if cached else _yield_to_views(active)):
+            return
+
+        try:
+            for _, tile in _grab_tiles([key]):
+                if mosaic is not None:
+                    tile.image  # pylint: disable=pointless-statement
+                    mosaic.paste(key, tile)
+
+        except Exception:  # pylint: disable=broad-except
+            # a failed tile is fetched again when it is needed
+            _LOGGER.debug('tile %s could not be loaded', key, exc_info=True)
+
+
+def _tile_bounds(latitude, longitude, zoom, ntiles, radius_meters):
+    ''' returns (north, west), (south, east) of the ntiles x ntiles grid '''
     west = _x_to_lon(-ntiles / 2 * _TILESIZE, longitude, zoom)
     east = _x_to_lon(ntiles / 2 * _TILESIZE, longitude, zoom)
 
     north = _y_to_lat(-ntiles / 2 * _TILESIZE, latitude, zoom)
     south = _y_to_lat(ntiles / 2 * _TILESIZE, latitude, zoom)
 
-    # TODO: DEBUG PRINT LINE
-    print(f'------------------------------------------------\n'
-          f'center point: {longitude}, {latitude}\n'
-          f'west: {west:0.4f}, east: {east:0.4f}\n'
-          f'north: {north:0.4f}, south: {south:0.4f}\n'
-          f'tiles: {ntiles}, radius: {radius_meters}, zoom: {zoom}\n'
-          f'------------------------------------------------')
+    _LOGGER.debug('center point: %s, %s, west: %.4f, east: %.4f, north: %.4f, '
+                  'south: %.4f, tiles: %s, radius: %s, zoom: %s', longitude, latitude,
+                  west, east, north, south, ntiles, radius_meters, zoom)
+
+    return (north, west), (south, east)
+
+
+def _fetch_tiles(latitude, longitude, zoom, maptype, radius_meters, default_ntiles,
+                 width, height):
+    '''
+    Fetches tiles from GoogleMaps at the specified coordinates, zoom level (0-22), and map
+    type ('roadmap', 'terrain', 'satellite', or 'hybrid').  The value of radius_meters
+    deteremines the number of tiles that will be fetched; if it is unspecified, the number
+    defaults to default_ntiles.  Tiles are cached as JPEG images in the tile store.
+    Only the tiles around the window of width x height pixels are fetched, the keys of
+    the other tiles are returned for _warm_tiles.
+    '''
+    latitude = _roundto(latitude, _DEGREE_PRECISION)
+    longitude = _roundto(longitude, _DEGREE_PRECISION)
+
+    ntiles, mosaic, keys, other_keys = _new_mosaic(
+        latitude, longitude, zoom, maptype, radius_meters, default_ntiles, width, height)
+
+    # paste the tiles as they arrive, the rate of downloads is limited by _RATE_LIMITER
+    for key, tile in _grab_tiles(keys):
+        mosaic.paste(key, tile)
+
+    northwest, southeast = _tile_bounds(latitude, longitude, zoom, ntiles, radius_meters)
+    return mosaic, ntiles, northwest, southeast, other_keys
+
+
+async def _fetch_tiles_async(latitude, longitude, zoom, maptype, radius_meters,
+                             default_ntiles, width, height):
+    '''
+    Awaitable version of _fetch_tiles, the tiles are fetched concurrently on the running
+    event loop. When the calling task is cancelled, the downloads that have not yet
+    started are cancelled as well.
+    '''
+    latitude = _roundto(latitude, _DEGREE_PRECISION)
+    longitude = _roundto(longitude, _DEGREE_PRECISION)
+
+    ntiles, mosaic, keys, other_keys = _new_mosaic(
+        latitude, longitude, zoom, maptype, radius_meters, default_ntiles, width, height)
+
+    async for key, tile in _grab_tiles_async(keys):
+        mosaic.paste(key, tile)
+
+    northwest, southeast = _tile_bounds(latitude, longitude, zoom, ntiles, radius_meters)
+    return mosaic, ntiles, northwest, southeast, other_keys
+
+
+def _zoom_preview(image, scale, maptype, zoom, centerx, centery):
+    '''
+    Returns a preview of the view in image after zooming by scale. For zooming in the
+    center of image is enlarged. For zooming out image is reduced and centered on top of
+    the cached tiles around it, which are decoded at reduced size. The view is centered
+    on world pixel centerx, centery at zoom.
+    '''
+    width, height = image.size
+    if scale >= 1:
+        box = (width / 2 * (1 - 1 / scale), height / 2 * (1 - 1 / scale),
+               width / 2 * (1 + 1 / scale), height / 2 * (1 + 1 / scale))
+        return image.resize((width, height), PIL.Image.BILINEAR, box=box)
+
+    preview = _new_image(width, height)
+    if scale >= _MIN_OVERVIEW_SCALE:
+        size = round(_TILESIZE * scale)
+        left = centerx - width / 2 / scale
+        upper = centery - height / 2 / scale
+        for key in _grid_keys(maptype, zoom, left, upper, width / scale, height / scale,
+                              _TILESIZE):
+            tile = _TILE_CACHE.get(key)
+            if tile is not None:
+                preview.paste(tile.reduced(size),
+                              (round((key.x - _TILESIZE // 2 - left) * scale),
+                               round((key.y - _TILESIZE // 2 - upper) * scale)))
+
+    reduced = image.resize(
+        (max(1, round(width * scale)), max(1, round(height * scale))), PIL.Image.BILINEAR)
+    preview.paste(reduced,
+                  ((width - reduced.size[0]) // 2, (height - reduced.size[1]) // 2))
+    return preview
+
+
+def _write_snapshot(path, image, view):
+    ''' writes image to the PNG file path with the dict view in a text chunk '''
+    info = PIL.PngImagePlugin.PngInfo()
+    info.add_text(_SNAPSHOT_KEY, json.dumps(view))
+
+    # a snapshot written at exit must not be left half written
+    temppath = f'{path}.{os.getpid()}.tmp'
+    image.save(temppath, format='PNG', pnginfo=info)
+    os.replace(temppath, path)
+
+
+def _read_snapshot(path):
+    '''
+    Returns the RGB image and the dict view of the snapshot in path, raises ValueError
+    when the file is not a snapshot
+    '''
+    with PIL.Image.open(path) as image:
+        text = getattr(image, 'text', {}).get(_SNAPSHOT_KEY)
+        if text is None:
+            raise ValueError(f'{path} is not a goompy snapshot')
+
+        return image.convert('RGB'), json.loads(text)
+
+
+def _preview_tiles(latitude, longitude, zoom, maptype, radius_meters, default_ntiles,
+                   preview):
+    '''
+    Returns the mosaic, ntiles and bounds for the view like _fetch_tiles without waiting
+    for the network. The preview image is shown in the center of the mosaic with the
+    tiles found in the tiles cache, or composed from the cached tiles at the next zoom
+    level, on top. Also returns the keys of the tiles around the window that still need
+    to be fetched, the tiles closest to the center first, and the keys of the other
+    tiles of the big image.
+    '''
+    latitude = _roundto(latitude, _DEGREE_PRECISION)
+    longitude = _roundto(longitude, _DEGREE_PRECISION)
+
+    ntiles, mosaic, keys, other_keys = _new_mosaic(
+        latitude, longitude, zoom, maptype, radius_meters, default_ntiles, *preview.size)
+    bigsize = ntiles * _TILESIZE
+    mosaic.paste_image(
+        preview, (bigsize - preview.size[0]) / 2, (bigsize - preview.size[1]) / 2)
+
+    cached = _cached_tiles(keys)
+    for key, tile in cached.items():
+        mosaic.paste(key, tile)
+
+    # after zooming out, the tiles of the previous zoom level give a sharper preview
+    pending = [key for key in keys if key not in cached]
+    for key, tile in _derive_tiles(pending, cached_only=True).items():
+        mosaic.paste(key, tile)
+
+    centerx = mosaic.originx + bigsize / 2
+    centery = mosaic.originy + bigsize / 2
+    pending.sort(key=lambda key: (key.x - centerx)**2 + (key.y - centery)**2)
+
+    northwest, southeast = _tile_bounds(latitude, longitude, zoom, ntiles, radius_meters)
+    return mosaic, ntiles, northwest, southeast, pending, other_keys
+
+
+def _extend_mosaic(mosaic, x, y, width, height):
+    '''
+    Fetches only the tiles that become exposed when the window x, y, width, height
+    with a margin of half a tile is moved outside the mosaic. Tiles that could not be
+    fetched are fetched again on the next move.
+    '''
+    keys = _cover_window(mosaic, x, y, width, height)
+    try:
+        for key, tile in _grab_tiles(keys):
+            mosaic.paste(key, tile)
 
-    return bigimage, ntiles, (north, west), (south, east)
+    finally:
+        mosaic.release(keys)
@@ -0,0 +1,176 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import math as m
+import threading
+from ._tilestore import TileKey
+from ._stats import _STATS
+
+
+def _grid_keys(maptype, zoom, x, y, width, height, tilesize):
+    '''
+    Returns the keys of the grid tiles that cover the rectangle x, y, width, height in
+    world pixels at zoom
+    '''
+    columns = range(m.floor(x / tilesize), m.floor((x + width - 1) / tilesize) + 1)
+    rows = range(m.floor(y / tilesize), m.floor((y + height - 1) / tilesize) + 1)
+
+    keys = []
+    for column in columns:
+        for row in rows:
+            keys.append(TileKey(maptype, zoom, column * tilesize + tilesize // 2,
+                                row * tilesize + tilesize // 2))
+
+    return keys
+
+
+def _paste_tile(image, tile, x, y):
+    '''
+    Pastes the tile image into image at x, y. RGBX images mapped from a tile pack have
+    the layout of RGB images in memory, they are copied into an RGB image as they are
+    rather than converted to RGB on every paste.
+    '''
+    if tile.mode == 'RGBX' and image.mode == 'RGB':
+        image.im.paste(tile.im, (x, y, x + tile.size[0], y + tile.size[1]))
+
+    else:
+        image.paste(tile, (x, y))
+
+
+class _TileMosaic(object):
+    '''
+    Virtual mosaic of the grid tiles in a range of ntiles columns and rows around the
+    window. The tiles are kept individually and only the tiles that intersect the window
+    are pasted into the window image, so the memory taken is bounded by the window size
+    rather than by the size of the big image. A preview image is shown where tiles are
+    still missing.
+
+    Positions x, y are in pixels of the big image, with its upper left corner at world
+    pixel originx, originy.
+    '''
+    def __init__(self, maptype, zoom, originx, originy, ntiles, tilesize):
+        self.maptype = maptype
+        self.zoom = zoom
+        self.originx = originx
+        self.originy = originy
+        self.ntiles = ntiles
+        self.tilesize = tilesize
+        self.columns = range(0)
+        self.rows = range(0)
+        self.tiles = {}
+        self.preview = None
+        self._requested = set()
+
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        ''' memory taken by the tiles of the mosaic, counted as decoded '''
+        with self._lock:
+            return sum(tile.nbytes for tile in self.tiles.values())
+
+    def missing(self, keys):
+        ''' returns the keys of the mosaic that have no tile yet '''
+        with self._lock:
+            return [key for key in keys if self._contains(key) and key not in self.tiles]
+
+    def _move_range(self, tiles, first, last):
+        if first >= tiles.start and last < tiles.stop:
+            return tiles
+
+        if last - first >= self.ntiles:
+            raise ValueError(f'mosaic of {self.ntiles} tiles is too small')
+
+        # center the needed tiles in the range
+        start = first - (self.ntiles - (last - first + 1)) // 2
+        return range(start, start + self.ntiles)
+
+    def _contains(self, key):
+        return (key.x // self.tilesize in self.columns and
+                key.y // self.tilesize in self.rows)
+
+    def cover(self, x, y, width, height):
+        '''
+        Moves the columns and rows of the mosaic when needed to cover the rectangle
+        x, y, width, height and returns the keys of the tiles in the rectangle that have
+        become exposed, each key is returned once while it stays in the mosaic. The
+        tiles outside the new columns and rows are dropped.
+        '''
+        size = self.tilesize
+        columns = self._move_range(
+            self.columns, m.floor((self.originx + x) / size),
+            m.floor((self.originx + x + width - 1) / size))
+        rows = self._move_range(
+            self.rows, m.floor((self.originy + y) / size),
+            m.floor((self.originy + y + height - 1) / size))
+        keys = _grid_keys(self.maptype, self.zoom, self.originx + x, self.originy + y,
+                          width, height, size)
+
+        with self._lock:
+            self.columns = columns
+            self.rows = rows
+            self.tiles = {key: tile for key, tile in self.tiles.items()
+                          if self._contains(key)}
+            keys = [key for key in keys if key not in self._requested]
+            self._requested = {key for key in self._requested if self._contains(key)}
+            self._requested.update(keys)
+
+        return keys
+
+    def release(self, keys):
+        '''
+        Forgets the keys returned by cover that have no tile, after their download
+        failed, so that cover returns them again
+        '''
+        with self._lock:
+            self._requested.difference_update(
+                [key for key in keys if key not in self.tiles])
+
+    def paste(self, key, tile):
+        '''
+        Adds the tile to the mosaic if the tile is still part of the mosaic, returns
+        whether the tile was added
+        '''
+        with self._lock:
+            if self._contains(key):
+                self.tiles[key] = tile
+                return True
+
+            return False
+
+    def paste_image(self, image, x, y):
+        ''' shows image at x, y where tiles are missing '''
+        with self._lock:
+            self.preview = image, self.originx + m.floor(x), self.originy + m.floor(y)
+
+    def compose(self, image, x, y):
+        ''' pastes the part of the mosaic at x, y into image '''
+        left = self.originx + m.floor(x)
+        upper = self.originy + m.floor(y)
+        width, height = image.size
+        half = self.tilesize // 2
+
+        with self._lock, _STATS.timer('paste'):
+            image.paste((0, 0, 0), (0, 0, width, height))
+            if self.preview is not None:
+                preview, previewx, previewy = self.preview
+                image.paste(preview, (previewx - left, previewy - upper))
+
+            for key, tile in self.tiles.items():
+                tilex = key.x - half - left
+                tiley = key.y - half - upper
+                if -self.tilesize < tilex < width and -self.tilesize < tiley < height:
+                    _paste_tile(image, tile.image, tilex, tiley)
@@ -0,0 +1,128 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import numpy as np
+from ._projection import _WORLDTILE
+
+_MAXLAT = 85.0511  # Latitude limit of the web mercator projection
+
+
+def _to_world(lats, lons):
+    ''' converts arrays of latitudes and longitudes to world pixels at zoom 0 '''
+    sinlat = np.sin(np.radians(np.clip(lats, -_MAXLAT, _MAXLAT)))
+    x = (np.asarray(lons, dtype=float) + 180) / 360 * _WORLDTILE
+    y = (0.5 - np.log((1 + sinlat) / (1 - sinlat)) / (4 * np.pi)) * _WORLDTILE
+    return x, y
+
+
+class Overlay(object):
+    '''
+    Layer of points to draw on top of a GooMPy view. The points are kept in a grid
+    spatial index of 2**cellzoom x 2**cellzoom cells over the world, so that only the
+    points inside the window have to be converted and drawn. At low zoom levels the
+    visible points can be clustered to limit the number of items drawn.
+    '''
+    def __init__(self, cellzoom=10):
+        self.ncells = 2 ** cellzoom
+        self.lats = np.empty(0)
+        self.lons = np.empty(0)
+        self._index = None
+
+    def __len__(self):
+        return len(self.lats)
+
+    def add_points(self, lats, lons):
+        '''
+        Adds points given as sequences of latitudes and longitudes, returns the
+        indices of the added points
+        '''
+        start = len(self.lats)
+        self.lats = np.concatenate([self.lats, np.asarray(lats, dtype=float)])
+        self.lons = np.concatenate([self.lons, np.asarray(lons, dtype=float)])
+        self._index = None
+        return np.arange(start, len(self.lats))
+
+    def clear(self):
+        self.lats = np.empty(0)
+        self.lons = np.empty(0)
+        self._index = None
+
+    def _build_index(self):
+        # cells sorted by cell number row * ncells + column, with the points of a cell
+        # in order[starts[i]:starts[i + 1]]
+        x, y = _to_world(self.lats, self.lons)
+        cellsize = _WORLDTILE / self.ncells
+        columns = np.clip((x / cellsize).astype(np.int64), 0, self.ncells - 1)
+        rows = np.clip((y / cellsize).astype(np.int64), 0, self.ncells - 1)
+
+        cells = rows * self.ncells + columns
+        order = np.argsort(cells, kind='stable')
+        cells, starts = np.unique(cells[order], return_index=True)
+        starts = np.append(starts, len(order))
+        self._index = cells, starts, order
+
+    def _candidates(self, north, west, south, east):
+        if self._index is None:
+            self._build_index()
+
+        cells, starts, order = self._index
+        (left, right), (upper, lower) = _to_world([north, south], [west, east])
+        cellsize = _WORLDTILE / self.ncells
+        first_column = max(int(left / cellsize), 0)
+        last_column = min(int(right / cellsize), self.ncells - 1)
+        first_row = max(int(upper / cellsize), 0)
+        last_row = min(int(lower / cellsize), self.ncells - 1)
+
+        # each row of cells is a contiguous range of cell numbers
+        rows = np.arange(first_row, last_row + 1) * self.ncells
+        lo = np.searchsorted(cells, rows + first_column)
+        hi = np.searchsorted(cells, rows + last_column, side='right')
+        return np.concatenate(
+            [order[starts[i]:starts[j]] for i, j in zip(lo, hi) if j > i] or
+            [np.empty(0, dtype=np.int64)])
+
+    def query(self, goompy):
+        '''
+        Returns the indices and window x, y pixel coordinates of the points inside the
+        window of goompy
+        '''
+        north = goompy.get_lat_from_y(0)
+        south = goompy.get_lat_from_y(goompy.height)
+        west = goompy.get_lon_from_x(0)
+        east = goompy.get_lon_from_x(goompy.width)
+
+        indices = self._candidates(north, west, south, east)
+        x = goompy.get_xwin_from_lon_array(self.lons[indices])
+        y = goompy.get_ywin_from_lat_array(self.lats[indices])
+
+        inside = (x >= 0) & (x < goompy.width) & (y >= 0) & (y < goompy.height)
+        return indices[inside], x[inside], y[inside]
+
+    def cluster(self, goompy, cellsize=40):
+        '''
+        Returns the window x, y pixel coordinates and number of points of the clusters
+        of points inside the window of goompy. Points are clustered per square of
+        cellsize pixels and a cluster is drawn at the mean position of its points.
+        '''
+        _, x, y = self.query(goompy)
+        columns = x // cellsize
+        rows = y // cellsize
+        cells = rows * (goompy.width // cellsize + 1) + columns
+
+        cells, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        sumx = np.bincount(inverse, weights=x, minlength=len(cells))
+        sumy = np.bincount(inverse, weights=y, minlength=len(cells))
+        return sumx / counts, sumy / counts, counts
@@ -0,0 +1,145 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import time
+import heapq
+import threading
+from collections import deque
+from ._mosaic import _grid_keys
+from ._goompy_functions import _TILE_CACHE, _load_tiles, _yield_to_views
+
+_VISIBLE = 0       # Priority of the tiles in the window
+_AHEAD = 1         # Priority of the tiles in the direction of travel, plus distance
+_NEXT_ZOOM = 100   # Priority of the tiles of the next zoom level
+
+
+class Prefetcher(object):
+    '''
+    Loads and decodes tiles into the tile caches on background workers, anticipating
+    where the view of a GooMPy object is heading. The moves of the last history seconds
+    give the velocity of the view and the tiles along the path for the next lookahead
+    seconds are loaded, optionally followed by the tiles of the next zoom level around
+    the center. The queue of at most maxsize tiles is ordered by priority so that the
+    visible tiles always come first. Tiles are only downloaded while half the burst of
+    the rate limit is left for the views.
+    '''
+    def __init__(self, lookahead=1.0, history=0.25, maxsize=64, nworkers=2,
+                 next_zoom=True):
+        self.lookahead = lookahead
+        self.history = history
+        self.maxsize = maxsize
+        self.next_zoom = next_zoom
+
+        self._moves = deque()
+        self._heap = []
+        self._loading = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        self._workers = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(nworkers)]
+        for worker in self._workers:
+            worker.start()
+
+    def record_move(self, goompy, dx, dy):
+        ''' records a move of the view by dx, dy and schedules the tiles ahead '''
+        now = time.monotonic()
+        self._moves.append((now, dx, dy))
+        while self._moves and self._moves[0][0] < now - self.history:
+            self._moves.popleft()
+
+        self.schedule(goompy)
+
+    def velocity(self):
+        ''' returns the velocity of the view in pixels per second '''
+        if len(self._moves) < 2:
+            return 0, 0
+
+        elapsed = max(self._moves[-1][0] - self._moves[0][0], 1e-3)
+        return (sum(move[1] for move in self._moves) / elapsed,
+                sum(move[2] for move in self._moves) / elapsed)
+
+    def schedule(self, goompy):
+        '''
+        Replaces the queued tiles with the tiles for the current view of goompy
+        '''
+        mosaic = goompy.mosaic
+        size = mosaic.tilesize
+        x = mosaic.originx + goompy.leftx
+        y = mosaic.originy + goompy.uppery
+        width, height = goompy.width, goompy.height
+
+        priorities = {}
+        for key in _grid_keys(mosaic.maptype, mosaic.zoom, x, y, width, height, size):
+            priorities[key] = _VISIBLE
+
+        # tiles along the path of the window in the next lookahead seconds
+        vx, vy = self.velocity()
+        steps = int(max(abs(vx), abs(vy)) * self.lookahead / (size / 2))
+        for step in range(1, steps + 1):
+            t = step * self.lookahead / steps
+            for key in _grid_keys(mosaic.maptype, mosaic.zoom, x + vx * t, y + vy * t,
+                                  width, height, size):
+                priorities.setdefault(key, _AHEAD + step)
+
+        # tiles of the next zoom level around the center of the window
+        if self.next_zoom and mosaic.zoom < 21:
+            for key in _grid_keys(mosaic.maptype, mosaic.zoom + 1, 2 * x + width / 2,
+                                  2 * y + height / 2, width, height, size):
+                priorities.setdefault(key, _NEXT_ZOOM)
+
+        items = [(priority, i, key) for i, (key, priority) in enumerate(priorities.items())]
+        with self._condition:
+            self._heap = heapq.nsmallest(self.maxsize, items)
+            self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._heap = []
+            self._condition.notify_all()
+
+    def _next_key(self):
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return None
+
+                while self._heap:
+                    _, _, key = heapq.heappop(self._heap)
+                    if key not in self._loading:
+                        self._loading.add(key)
+                        return key
+
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            key = self._next_key()
+            if key is None:
+                return
+
+            try:
+                if key not in _TILE_CACHE and _yield_to_views(lambda: not self._stopped):
+                    _load_tiles([key], decode=True)
+
+            except Exception:  # pylint: disable=broad-except
+                # a failed prefetch is retried when the tile is needed
+                pass
+
+            finally:
+                with self._condition:
+                    self._loading.discard(key)
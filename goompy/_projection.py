@@ -0,0 +1,45 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import math as m
+
+_WORLDTILE = 256  # Size in pixels of the whole world at zoom = 0
+
+
+def _worldsize(zoom):
+    ''' size in pixels of the whole world at zoom '''
+    return _WORLDTILE * 2 ** zoom
+
+
+def _lon_to_worldx(lon, zoom):
+    ''' converts longitude to x in world pixels at zoom '''
+    return (lon + 180) / 360 * _worldsize(zoom)
+
+
+def _lat_to_worldy(lat, zoom):
+    ''' converts latitude to y in world pixels at zoom '''
+    sinlat = m.sin(m.radians(lat))
+    return (0.5 - m.log((1 + sinlat) / (1 - sinlat)) / (4 * m.pi)) * _worldsize(zoom)
+
+
+def _worldx_to_lon(x, zoom):
+    ''' converts x in world pixels at zoom to longitude '''
+    return x / _worldsize(zoom) * 360 - 180
+
+
+def _worldy_to_lat(y, zoom):
+    ''' converts y in world pixels at zoom to latitude '''
+    return m.degrees(m.atan(m.sinh(m.pi * (1 - 2 * y / _worldsize(zoom)))))
@@ -0,0 +1,44 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import PIL.Image
+from ._tilestore import TileKey
+
+_QUADRANTS = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+
+def _child_keys(key, tilesize):
+    '''
+    Returns the keys of the four tiles at zoom + 1 that cover the grid tile key, in the
+    order upper left, upper right, lower left, lower right. The grid tile in column c
+    at zoom covers the columns 2c and 2c + 1 at zoom + 1, and likewise for the rows.
+    '''
+    column, row = key.x // tilesize, key.y // tilesize
+    return [TileKey(key.maptype, key.zoom + 1, (2 * column + i) * tilesize + tilesize // 2,
+                    (2 * row + j) * tilesize + tilesize // 2) for i, j in _QUADRANTS]
+
+
+def _compose_parent(children, tilesize):
+    '''
+    Returns the image of a parent tile composed from its four child tiles, in the order
+    of _child_keys, each reduced to half size
+    '''
+    half = tilesize // 2
+    parent = PIL.Image.new('RGB', (tilesize, tilesize))
+    for (i, j), child in zip(_QUADRANTS, children):
+        parent.paste(child.reduced(half), (i * half, j * half))
+
+    return parent
@@ -0,0 +1,91 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import time
+import threading
+import multiprocessing
+
+
+class _TokenBucket(object):
+    '''
+    Thread safe token bucket. Tokens are added at a sustained rate (tokens per second)
+    up to a maximum of burst tokens, so that short bursts of requests go through
+    immediately while the long term rate never exceeds the given rate.
+    '''
+    def __init__(self, rate, burst):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+
+    def configure(self, rate, burst):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def available(self):
+        ''' returns the number of tokens that can be taken without waiting '''
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def acquire(self, tokens=1):
+        '''
+        Blocks until the tokens are available and returns the time waited in seconds
+        '''
+        waited = 0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+
+                delay = (tokens - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+def _shared(index):
+    # property kept in the shared state array
+    return property(lambda self: self._state[index],
+                    lambda self, value: self._state.__setitem__(index, value))
+
+
+class _SharedTokenBucket(_TokenBucket):
+    '''
+    Token bucket that is shared by processes, the tokens are kept in shared memory and
+    guarded by a process lock, so that the rate holds for all processes together. The
+    bucket is passed to the processes when they are started.
+    '''
+    rate = _shared(0)
+    burst = _shared(1)
+    _tokens = _shared(2)
+    _last = _shared(3)
+
+    def __init__(self, rate, burst, context=None):  # pylint: disable=super-init-not-called
+        context = context or multiprocessing.get_context()
+        self._lock = context.Lock()
+        self._state = context.RawArray('d', [rate, burst, burst, time.monotonic()])
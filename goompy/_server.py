@@ -0,0 +1,217 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import sys
+import math
+import logging
+import argparse
+import threading
+import http.client
+import http.server
+from io import BytesIO
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from ._goompy import GooMPy
+from ._goompy_functions import _roundto, _DEGREE_PRECISION
+from ._tilecache import _TileCache
+from ._singleflight import _SingleFlight
+from ._stats import _STATS
+
+_LOGGER = logging.getLogger('goompy')
+_MAPTYPES = ('roadmap', 'terrain', 'satellite', 'hybrid')
+_FORMATS = {'png': ('PNG', 'image/png'), 'jpg': ('JPEG', 'image/jpeg'),
+            'jpeg': ('JPEG', 'image/jpeg')}
+_MAX_SIZE = 2048                 # Largest width and height of a rendered map
+_QUEUE_FACTOR = 4                # Requests that can wait per worker
+_RESPONSE_CACHE_BYTES = 32 * 2**20
+
+
+class _Response(namedtuple('_Response', 'content_type body')):
+    __slots__ = ()
+
+    @property
+    def nbytes(self):
+        return len(self.body)
+
+
+class _View(namedtuple('_View', 'latitude longitude zoom maptype width height format')):
+    '''
+    Normalized parameters of a rendered map, views that render the same image are equal
+    '''
+    __slots__ = ()
+
+    @classmethod
+    def from_query(cls, query):
+        ''' returns the view for the query string, raises ValueError when it is invalid '''
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        try:
+            latitude, longitude = float(params['lat']), float(params['lon'])
+            if not (math.isfinite(latitude) and math.isfinite(longitude)):
+                raise ValueError('latitude and longitude must be finite')
+
+            view = cls(_roundto(latitude, _DEGREE_PRECISION),
+                       _roundto(longitude, _DEGREE_PRECISION),
+                       int(params['zoom']), params.get('maptype', 'roadmap'),
+                       int(params.get('width', 640)), int(params.get('height', 640)),
+                       params.get('format', 'png').lower())
+
+        except KeyError as error:
+            raise ValueError(f'missing parameter {error}')
+
+        if not -85 < view.latitude < 85 or not -180 <= view.longitude <= 180:
+            raise ValueError('latitude or longitude out of range')
+
+        if not 0 <= view.zoom <= 21:
+            raise ValueError('zoom must be 0 through 21')
+
+        if view.maptype not in _MAPTYPES:
+            raise ValueError(f'maptype must be one of {", ".join(_MAPTYPES)}')
+
+        if not (0 < view.width <= _MAX_SIZE and 0 < view.height <= _MAX_SIZE):
+            raise ValueError(f'width and height must be 1 through {_MAX_SIZE}')
+
+        if view.format not in _FORMATS:
+            raise ValueError('format must be png or jpg')
+
+        return view
+
+
+def _render(view):
+    ''' returns the response with the encoded image of view '''
+    goompy = GooMPy(view.width, view.height, view.latitude, view.longitude, view.zoom,
+                    default_ntiles=1)
+    goompy.use_map_type(view.maptype)
+
+    imagefile = BytesIO()
+    image_format, content_type = _FORMATS[view.format]
+    with _STATS.timer('encode'):
+        goompy.get_image().save(imagefile, format=image_format)
+    return _Response(content_type, imagefile.getvalue())
+
+
+class _MapHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlsplit(self.path)
+        if url.path != '/map':
+            self.send_error(404)
+            return
+
+        try:
+            response = self.server.get_response(_View.from_query(url.query))
+
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+
+        except (OSError, http.client.HTTPException):
+            self.send_error(502, 'tiles could not be downloaded')
+            return
+
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception('map %s could not be rendered', self.path)
+            self.send_error(500, 'map could not be rendered')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class MapServer(http.server.HTTPServer):
+    '''
+    HTTP server that renders map images, for example
+    /map?lat=52.37&lon=4.89&zoom=15&width=800&height=500&maptype=roadmap&format=png
+
+    Requests are handled by a pool of worker threads, at most _QUEUE_FACTOR requests
+    per worker wait to be handled. The responses are kept in a least recently used
+    cache of cache_bytes and concurrent requests for the same view share one rendering.
+    All renderings share the tile caches and the tile downloads.
+    '''
+    def __init__(self, address=('127.0.0.1', 8000), workers=8,
+                 cache_bytes=_RESPONSE_CACHE_BYTES):
+        http.server.HTTPServer.__init__(self, address, _MapHandler)
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='goompy-server')
+        self._slots = threading.BoundedSemaphore(workers * _QUEUE_FACTOR)
+        self._responses = _TileCache(cache_bytes)
+        self._renderings = _SingleFlight()
+
+    def process_request(self, request, client_address):
+        # blocks accepting new connections while the queue of the workers is full
+        self._slots.acquire()
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(request, client_address)
+
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def get_response(self, view):
+        ''' returns the response for view from the cache or renders it '''
+        response = self._responses.get(view)
+        if response is None:
+            response, _ = self._renderings.do(view, self._render, view)
+
+        return response
+
+    def _render(self, view):
+        response = _render(view)
+        self._responses.put(view, response)
+        return response
+
+    def server_close(self):
+        http.server.HTTPServer.server_close(self)
+        self._executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    ''' command line tool to run the map server '''
+    parser = argparse.ArgumentParser(
+        prog='goompy-serve', description='Serves rendered map images over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    server = MapServer((args.host, args.port), workers=args.workers)
+    print(f'serving maps on http://{args.host}:{server.server_port}/map')
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
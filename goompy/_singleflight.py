@@ -0,0 +1,60 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import threading
+from concurrent.futures import Future
+
+
+class _SingleFlight(object):
+    '''
+    Makes at most one call at a time per key. Callers that ask for a key while a call
+    for it is in flight wait for the result of that call instead of making their own.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, function, *args):
+        '''
+        Returns (result, owner) of function(*args), owner is False when the result is
+        shared from the call of another caller. Exceptions are shared in the same way.
+        '''
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+
+        if not owner:
+            return future.result(), False
+
+        try:
+            result = function(*args)
+
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+
+        else:
+            future.set_result(result)
+            return result, True
+
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,94 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+_LOGGER = logging.getLogger('goompy')
+
+
+class Stats(object):
+    '''
+    Thread safe timings per stage and counters. The stages of GooMPy are download,
+    store_read, store_write, decode, derive, encode, paste and update; the counters are
+    downloads, bytes_downloaded, rate_limit_wait (seconds), pack_hits, cache_hits,
+    cache_misses, store_hits and store_misses. Hooks are called as hook(stage, seconds)
+    for every timing and the timings are logged at debug level to the goompy logger.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = defaultdict(int)
+        self._hooks = []
+
+    @contextmanager
+    def timer(self, stage):
+        ''' context manager that records the time spent in its block for stage '''
+        start = time.perf_counter()
+        try:
+            yield
+
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self._timings.get(stage, (0, 0, 0))
+            self._timings[stage] = count + 1, total + seconds, max(longest, seconds)
+            hooks = list(self._hooks)
+
+        _LOGGER.debug('%s took %.1f ms', stage, seconds * 1000)
+        for hook in hooks:
+            hook(stage, seconds)
+
+    def count(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def add_hook(self, hook):
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        with self._lock:
+            self._hooks.remove(hook)
+
+    def snapshot(self):
+        '''
+        Returns a dict with per stage the count, total, mean and max time in seconds
+        under 'timings' and the counters under 'counters'
+        '''
+        with self._lock:
+            timings = {stage: {'count': count, 'total': total, 'mean': total / count,
+                               'max': longest}
+                       for stage, (count, total, longest) in self._timings.items()}
+            return {'timings': timings, 'counters': dict(self._counters)}
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+
+_STATS = Stats()
+
+
+def get_stats():
+    ''' returns the Stats of all GooMPy instances in this process '''
+    return _STATS
@@ -0,0 +1,146 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import threading
+from io import BytesIO
+from collections import OrderedDict
+import PIL.Image
+from ._stats import _STATS
+
+
+def _open_rgb(data, size=None):
+    '''
+    Decodes the encoded image data as RGB, with size the image is reduced to size x size
+    pixels, using JPEG draft mode to decode at a reduced scale
+    '''
+    with _STATS.timer('decode'):
+        image = PIL.Image.open(BytesIO(data))
+        if size is not None:
+            image.draft('RGB', (size, size))
+
+        # Some tiles are in mode `RGBA` and need to be converted
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if size is not None and image.size != (size, size):
+            image = image.resize((size, size), PIL.Image.BILINEAR)
+
+        image.load()
+
+    return image
+
+
+class _Tile(object):
+    '''
+    Tile kept as the original encoded bytes data, it is decoded only when its image is
+    needed. A tile can also be created from an already decoded image.
+    '''
+    def __init__(self, data=None, image=None):
+        self.data = data
+        self._image = image
+        self._lock = threading.Lock()
+
+        if image is None:
+            image = PIL.Image.open(BytesIO(data))
+
+        self.size = image.size
+        self.nbytes = (len(data) if data else 0) + self.size[0] * self.size[1] * 3
+
+    @property
+    def image(self):
+        ''' the decoded RGB image, decoded on first use '''
+        with self._lock:
+            if self._image is None:
+                self._image = _open_rgb(self.data)
+
+            return self._image
+
+    def reduced(self, size):
+        ''' returns the image reduced to size x size pixels '''
+        if self.data is None or self._image is not None:
+            return self.image.resize((size, size), PIL.Image.BILINEAR)
+
+        return _open_rgb(self.data, size)
+
+
+class _TileCache(object):
+    '''
+    Thread safe least recently used cache of tiles. The least recently used tiles are
+    evicted when the memory taken by the tiles, counted as decoded, exceeds max_bytes.
+    Tiles in the cache are shared and must not be modified. The size of a tile is
+    counted when it is put.
+    '''
+    def __init__(self, max_bytes):
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._tiles
+
+    def get(self, key):
+        ''' returns the tile for key or None if it is not in the cache '''
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, tile):
+        nbytes = tile.nbytes
+        with self._lock:
+            old_entry = self._tiles.pop(key, None)
+            if old_entry is not None:
+                self.nbytes -= old_entry[1]
+
+            self._tiles[key] = tile, nbytes
+            self.nbytes += nbytes
+            self._evict()
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+
+    def info(self):
+        ''' returns a dict with the size and hit/ miss counters of the cache '''
+        with self._lock:
+            return {'tiles': len(self._tiles), 'nbytes': self.nbytes,
+                    'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._tiles:
+            _, (_, nbytes) = self._tiles.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
@@ -0,0 +1,106 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import os
+import mmap
+import struct
+import numpy as np
+import PIL.Image
+from ._tilestore import TileKey
+
+# A tile pack is a header, an index with the key of each tile and the raw tiles in
+# the order of the index. The tiles start on a page boundary and are stored as RGBX,
+# the layout PIL uses in memory, so that images can be mapped without copying.
+_MAGIC = b'GOOMPYPK'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIIQ')  # magic, version, tilesize, number of tiles, offset
+_ENTRY = np.dtype([('maptype', 'S16'), ('zoom', '<u4'), ('x', '<u4'), ('y', '<u4')])
+_MODE = 'RGBX'
+_PAGESIZE = mmap.ALLOCATIONGRANULARITY
+
+
+def _write_tile_pack(path, keys, tiles, tilesize):
+    '''
+    Writes the tile pack for keys to path, tiles yields (key, image) for the keys in
+    any order. The pack is written to a temporary file that replaces path when done.
+    '''
+    slots = {key: slot for slot, key in enumerate(keys)}
+    entries = np.array([(key.maptype.encode('ascii'), key.zoom, key.x, key.y)
+                        for key in keys], dtype=_ENTRY)
+    offset = -(-(_HEADER.size + entries.nbytes) // _PAGESIZE) * _PAGESIZE
+    tilebytes = tilesize * tilesize * len(_MODE)
+
+    temppath = path + '.tmp'
+    try:
+        with open(temppath, 'wb') as packfile:
+            packfile.write(_HEADER.pack(_MAGIC, _VERSION, tilesize, len(keys), offset))
+            packfile.write(entries.tobytes())
+            packfile.truncate(offset + len(keys) * tilebytes)
+
+            for key, image in tiles:
+                packfile.seek(offset + slots[key] * tilebytes)
+                packfile.write(image.convert(_MODE).tobytes())
+
+        os.replace(temppath, path)
+
+    except BaseException:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+
+        raise
+
+
+class TilePack(object):
+    '''
+    Read only pack of raw tiles that is memory mapped. The images of the tiles are
+    mapped onto the pack without copying or decoding, so the pages are shared through
+    the page cache by all processes that use the same pack. Images taken from the pack
+    keep the pack mapped and must not be modified.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as packfile:
+            self._mmap = mmap.mmap(packfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.tilesize, count, self._offset = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'{path} is not a tile pack')
+
+        entries = np.frombuffer(self._mmap, dtype=_ENTRY, count=count, offset=_HEADER.size)
+        self._index = {
+            TileKey(maptype.decode('ascii'), int(zoom), int(x), int(y)): slot
+            for slot, (maptype, zoom, x, y) in enumerate(entries.tolist())}
+        self._tilebytes = self.tilesize * self.tilesize * len(_MODE)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return self._index.keys()
+
+    def get(self, key):
+        ''' returns the image of the tile for key or None if it is not in the pack '''
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+
+        start = self._offset + slot * self._tilebytes
+        return PIL.Image.frombuffer(
+            _MODE, (self.tilesize, self.tilesize),
+            memoryview(self._mmap)[start:start + self._tilebytes], 'raw', _MODE, 0, 1)
@@ -0,0 +1,311 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import os
+import time
+import sqlite3
+import threading
+from io import BytesIO
+from itertools import groupby
+from collections import namedtuple
+import PIL.Image
+from ._projection import _worldx_to_lon, _worldy_to_lat
+
+_BATCHSIZE = 400           # Maximum number of tiles in one sqlite query
+_ACCESS_BATCHSIZE = 10000  # Number of access times kept before they are written
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS metadata (
+    name TEXT PRIMARY KEY,
+    value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    maptype TEXT NOT NULL,
+    zoom_level INTEGER NOT NULL,
+    tile_x INTEGER NOT NULL,
+    tile_y INTEGER NOT NULL,
+    tile_data BLOB NOT NULL,
+    created INTEGER NOT NULL DEFAULT 0,
+    accessed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (maptype, zoom_level, tile_x, tile_y)) WITHOUT ROWID;
+INSERT OR IGNORE INTO metadata VALUES ('format', 'jpg');
+'''
+
+# columns added to the tiles of stores made by earlier versions, with the index on them
+_ADDED_COLUMNS = {'created': 'INTEGER NOT NULL DEFAULT 0',
+                  'accessed': 'INTEGER NOT NULL DEFAULT 0'}
+_INDEX = 'CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles (accessed)'
+
+
+class TileKey(namedtuple('TileKey', 'maptype zoom x y')):
+    '''
+    Identifies a map tile by its map type, zoom level and the x, y world pixel
+    coordinates of its center at that zoom level
+    '''
+    __slots__ = ()
+
+    @property
+    def latlon(self):
+        ''' returns the latitude, longitude of the center of the tile '''
+        return _worldy_to_lat(self.y, self.zoom), _worldx_to_lon(self.x, self.zoom)
+
+
+class TileStore(object):
+    '''
+    Interface of a persistent store of JPEG encoded map tiles. Lookups and inserts are
+    done in batches of tiles.
+    '''
+    def get_many(self, keys):
+        ''' returns a dict {key: data} of the tiles in keys that are found in the store '''
+        raise NotImplementedError
+
+    def put_many(self, tiles):
+        ''' stores the tiles given as a dict {key: data} '''
+        raise NotImplementedError
+
+    def contains_many(self, keys):
+        ''' returns the set of the tiles in keys that are found in the store '''
+        return set(self.get_many(keys))
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, data):
+        self.put_many({key: data})
+
+    def close(self):
+        pass
+
+
+class SQLiteTileStore(TileStore):
+    '''
+    Stores all tiles in a single sqlite file in a MBTiles like layout. The tiles are
+    indexed by (maptype, zoom_level, tile_x, tile_y). The store keeps the time each tile
+    was stored and last accessed, so that a CacheManager can hold it to a quota. Tiles
+    older than ttl[maptype] seconds are treated as missing, so that they are refreshed.
+    '''
+    def __init__(self, path):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self.path = path
+        self.ttl = {}
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(_SCHEMA)
+
+            columns = {row[1] for row in self._db.execute('PRAGMA table_info(tiles)')}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._db.execute(f'ALTER TABLE tiles ADD COLUMN {column} {definition}')
+
+            self._db.execute(_INDEX)
+
+    def __reduce__(self):
+        # a store passed to another process opens its own connection to the file and
+        # treats the same tiles as expired
+        return SQLiteTileStore, (self.path,), {'ttl': self.ttl}
+
+    def _select(self, columns, keys):
+        # yields the rows of columns for keys, selected per maptype and zoom in batches
+        keys = sorted(set(keys))
+        for (maptype, zoom), group in groupby(keys, key=lambda key: key[:2]):
+            group = list(group)
+            for i in range(0, len(group), _BATCHSIZE):
+                batch = group[i:i + _BATCHSIZE]
+                values = ','.join(['(?,?)'] * len(batch))
+                query = (f'SELECT {columns} FROM tiles '
+                         f'WHERE maptype=? AND zoom_level=? AND created>=? AND '
+                         f'(tile_x, tile_y) IN (VALUES {values})')
+                params = [maptype, zoom, self._expiry(maptype)]
+                for key in batch:
+                    params += [key.x, key.y]
+
+                with self._lock:
+                    rows = self._db.execute(query, params).fetchall()
+
+                for row in rows:
+                    yield (maptype, zoom) + row
+
+    def _expiry(self, maptype):
+        # tiles stored before the expiry time have expired
+        ttl = self.ttl.get(maptype)
+        return 0 if ttl is None else int(time.time() - ttl)
+
+    def get_many(self, keys):
+        tiles = {}
+        for maptype, zoom, x, y, data in self._select('tile_x, tile_y, tile_data', keys):
+            tiles[TileKey(maptype, zoom, x, y)] = data
+
+        # the access times are written in one batch by flush_access, also without a
+        # CacheManager once enough tiles have been read
+        now = int(time.time())
+        with self._lock:
+            self._accessed.update(dict.fromkeys(tiles, now))
+            flush = len(self._accessed) >= _ACCESS_BATCHSIZE
+
+        if flush:
+            self.flush_access()
+
+        return tiles
+
+    def contains_many(self, keys):
+        return {TileKey(*row) for row in self._select('tile_x, tile_y', keys)}
+
+    def put_many(self, tiles):
+        now = int(time.time())
+        rows = [(key.maptype, key.zoom, key.x, key.y, data, now, now)
+                for key, data in tiles.items()]
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO tiles (maptype, zoom_level, tile_x, tile_y, '
+                'tile_data, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def flush_access(self):
+        ''' writes the access times of the tiles that were read '''
+        with self._lock, self._db:
+            rows = [(accessed,) + key for key, accessed in self._accessed.items()]
+            self._accessed.clear()
+            self._db.executemany(
+                'UPDATE tiles SET accessed=? WHERE maptype=? AND zoom_level=? AND '
+                'tile_x=? AND tile_y=?', rows)
+
+    def info(self):
+        ''' returns a dict with the number of tiles and bytes per map type '''
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT maptype, count(*), sum(length(tile_data)) FROM tiles '
+                'GROUP BY maptype').fetchall()
+
+        return {maptype: {'tiles': count, 'nbytes': nbytes}
+                for maptype, count, nbytes in rows}
+
+    def delete_expired(self):
+        ''' deletes the tiles that are older than the ttl of their map type '''
+        deleted = 0
+        with self._lock, self._db:
+            for maptype in self.ttl:
+                deleted += self._db.execute(
+                    'DELETE FROM tiles WHERE maptype=? AND created<?',
+                    (maptype, self._expiry(maptype))).rowcount
+
+        return deleted
+
+    def evict(self, max_bytes):
+        '''
+        Deletes the least recently accessed tiles until the tiles take at most max_bytes,
+        returns the number of deleted tiles
+        '''
+        self.flush_access()
+        with self._lock, self._db:
+            nbytes = self._db.execute(
+                'SELECT coalesce(sum(length(tile_data)), 0) FROM tiles').fetchone()[0]
+            if nbytes <= max_bytes:
+                return 0
+
+            evicted = []
+            rows = self._db.execute(
+                'SELECT maptype, zoom_level, tile_x, tile_y, length(tile_data) FROM tiles '
+                'ORDER BY accessed')
+            for *key, size in rows:
+                evicted.append(key)
+                nbytes -= size
+                if nbytes <= max_bytes:
+                    break
+
+            rows.close()
+            self._db.executemany(
+                'DELETE FROM tiles WHERE maptype=? AND zoom_level=? AND tile_x=? AND '
+                'tile_y=?', evicted)
+
+        return len(evicted)
+
+    def verify(self):
+        '''
+        Decodes every tile and deletes the tiles that are corrupt or truncated, then
+        compacts the file. Returns the number of deleted tiles.
+        '''
+        corrupt = []
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT maptype, zoom_level, tile_x, tile_y, tile_data FROM tiles')
+            for *key, data in rows:
+                try:
+                    PIL.Image.open(BytesIO(data)).load()
+
+                except (OSError, SyntaxError, ValueError):
+                    corrupt.append(key)
+
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'DELETE FROM tiles WHERE maptype=? AND zoom_level=? AND tile_x=? AND '
+                    'tile_y=?', corrupt)
+
+            self._db.execute('VACUUM')
+
+        return len(corrupt)
+
+    def close(self):
+        self.flush_access()
+        with self._lock:
+            self._db.close()
+
+
+class DirectoryTileStore(TileStore):
+    '''
+    Legacy store with one JPEG file per tile in the folder path, named after the center
+    coordinates, zoom, map type and size of the tile.
+    '''
+    def __init__(self, path, tilesize=640):
+        self.path = path
+        self.tilesize = tilesize
+
+    def _filename(self, key):
+        lat, lon = key.latlon
+        specs = lat, lon, key.zoom, key.maptype, self.tilesize, self.tilesize
+        return os.path.join(self.path, ('%f_%f_%d_%s_%d_%d' % specs) + '.jpg')
+
+    def get_many(self, keys):
+        tiles = {}
+        for key in keys:
+            try:
+                with open(self._filename(key), 'rb') as jpgfile:
+                    tiles[key] = jpgfile.read()
+
+            except FileNotFoundError:
+                pass
+
+        return tiles
+
+    def contains_many(self, keys):
+        return {key for key in keys if os.path.exists(self._filename(key))}
+
+    def put_many(self, tiles):
+        # the tiles are written to a temporary file that is renamed when complete, so
+        # that a partly written tile is never read
+        os.makedirs(self.path, exist_ok=True)
+        for key, data in tiles.items():
+            filename = self._filename(key)
+            temppath = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temppath, 'wb') as jpgfile:
+                jpgfile.write(data)
+
+            os.replace(temppath, filename)
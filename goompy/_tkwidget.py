@@ -0,0 +1,137 @@
+'''
+GooMPy: Google Maps for Python
+Copyright (C) 2015 Alec Singer and Simon D. Levy
+This code is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU Lesser General Public License
+along with this code.  If not, see <http://www.gnu.org/licenses/>.
+
+Updated by Bruno Vermeulen @2019
+'''
+import tkinter as tk
+from PIL import ImageTk
+
+_FRAME_MS = 16           # Drags are applied at most once per frame of about 60 fps
+_POLL_MS = 50            # Interval to check for tiles that arrived in the background
+_SYMBOL_SIZE = 7         # Size of an overlay point
+_MAX_SYMBOL_SIZE = 100   # Size of the largest cluster of overlay points
+
+
+class MapWidget(tk.Canvas):
+    '''
+    Tkinter canvas that shows the view of a GooMPy object and can be dragged to pan.
+    The map is a single PhotoImage that is updated in place, the points of the optional
+    overlay are drawn on top and moved along while dragging. Bursts of drag events are
+    combined into at most one repaint per frame. Below cluster_zoom the overlay points
+    are clustered.
+
+    goompy must have a map type in use. The widget sets the on_update callback of goompy
+    to show the tiles that arrive in the background.
+    '''
+    def __init__(self, master, goompy, overlay=None, cluster_zoom=12, **kwargs):
+        tk.Canvas.__init__(self, master, width=goompy.width, height=goompy.height,
+                           highlightthickness=0, **kwargs)
+        self.goompy = goompy
+        self.overlay = overlay
+        self.cluster_zoom = cluster_zoom
+        self.overlay_options = {'fill': 'blue'}
+
+        self._photo = ImageTk.PhotoImage(goompy.copy_image())
+        self.create_image(0, 0, image=self._photo, anchor='nw', tags='map')
+
+        self._coords = None
+        self._pending = [0, 0]
+        self._frame = None
+        # tiles may have arrived before the widget took over on_update
+        self._tiles_arrived = True
+        goompy.on_update = self._on_update
+
+        self.bind('<Button-1>', self._press)
+        self.bind('<B1-Motion>', self._drag)
+        self.bind('<ButtonRelease-1>', self._release)
+
+        self.draw_overlay()
+        self._poll()
+
+    def _on_update(self):
+        # called from a background thread, tkinter must only be used from the main thread
+        self._tiles_arrived = True
+
+    def _poll(self):
+        if self._tiles_arrived:
+            self._tiles_arrived = False
+            self.repaint()
+
+        self.after(_POLL_MS, self._poll)
+
+    def _press(self, event):
+        self._coords = event.x, event.y
+
+    def _drag(self, event):
+        if self._coords is None:
+            return
+
+        self._pending[0] += self._coords[0] - event.x
+        self._pending[1] += self._coords[1] - event.y
+        self._coords = event.x, event.y
+        if self._frame is None:
+            self._frame = self.after(_FRAME_MS, self._apply_drag)
+
+    def _release(self, _event):
+        if self._frame is not None:
+            self.after_cancel(self._frame)
+            self._apply_drag()
+
+        self._coords = None
+        self.draw_overlay()
+
+    def _apply_drag(self):
+        self._frame = None
+        dx, dy = self._pending
+        self._pending = [0, 0]
+        if dx or dy:
+            self.goompy.move(dx, dy)
+            self.move('overlay', -dx, -dy)
+            self.repaint()
+
+    def repaint(self):
+        ''' shows the current image of goompy '''
+        self._photo.paste(self.goompy.copy_image())
+
+    def refresh(self):
+        ''' shows the current image and overlay after the view of goompy has changed '''
+        self.repaint()
+        self.draw_overlay()
+
+    def use_map_type(self, maptype):
+        self.goompy.use_map_type(maptype)
+        self.refresh()
+
+    def use_zoom(self, zoom):
+        ''' zooms to zoom showing a preview, the tiles are filled in as they arrive '''
+        self.goompy.use_zoom(zoom, preview=True)
+        self.refresh()
+
+    def draw_overlay(self):
+        ''' draws the overlay points inside the window, clustered at low zoom '''
+        self.delete('overlay')
+        if self.overlay is None:
+            return
+
+        if self.goompy.get_zoom < self.cluster_zoom:
+            xs, ys, counts = self.overlay.cluster(self.goompy)
+
+        else:
+            _, xs, ys = self.overlay.query(self.goompy)
+            counts = [1] * len(xs)
+
+        for x, y, count in zip(xs, ys, counts):
+            size = min(_SYMBOL_SIZE + 2 * (count - 1), _MAX_SYMBOL_SIZE) // 2
+            self.create_oval(x - size, y - size, x + size, y + size, tags='overlay',
+                             **self.overlay_options)
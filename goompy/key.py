@@ -18,5 +18,7 @@ from decouple import config
 
 
 # Get a key from https://developers.google.com/maps/documentation/staticmaps/#api_key and
-# put it between the quotation marks below:
-_KEY = config('GOOGLE_API_KEY')
+# set it as GOOGLE_API_KEY in the environment or in the file .env in the project folder
+def _read_key():
+    ''' returns the google api key or None when it is not set '''
+    return config('GOOGLE_API_KEY', default=None)
@@ -1,5 +1,5 @@
 '''
-setup.py - Python distutils setup file for GooMPy package.
+setup.py - Python setuptools setup file for GooMPy package.
 
 Copyright (C) 2015 Alec Singer and Simon D. Levy
 This code is free software: you can redistribute it and/or modify
@@ -16,14 +16,19 @@ along with this code.  If not, see <http://www.gnu.org/licenses/>.
 Updated by Bruno Vermeulen @2019
 '''
 
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='GooMPy',
     version='0.1',
-    install_requires=['PIL'],
+    install_requires=['Pillow', 'numpy'],
     description='Google Maps for Python',
     packages=['goompy',],
+    entry_points={
+        'console_scripts': ['goompy-prefetch=goompy._bulkfetch:main',
+                            'goompy-serve=goompy._server:main',
+                            'goompy-cache=goompy._cachemanager:main'],
+    },
     author='Alec Singer and Simon D. Levy',
     author_email='simon.d.levy@gmail.com',
     license='LGPL',
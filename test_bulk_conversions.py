@@ -0,0 +1,32 @@
+'''array conversions to/ from pixels must match the scalar conversions
+   tests for 4 quandrants in the world
+'''
+import numpy as np
+
+TEST_TOLERANCE = 1
+zoom = 15
+CENTERS = [(52.3755, 4.8994), (40.7044, -74.012), (-34.6246, -58.4017),
+           (-33.8566, 151.2153)]
+
+
+def test_array_conversions_match_scalar(make_goompy):
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-500, 1500, 1000)
+    y = rng.uniform(-500, 1500, 1000)
+
+    for latitude, longitude in CENTERS:
+        goompy = make_goompy(latitude, longitude, zoom, 123, -77)
+
+        lons = goompy.get_lon_from_x_array(x)
+        lats = goompy.get_lat_from_y_array(y)
+        assert np.allclose(lons, [goompy.get_lon_from_x(v) for v in x], atol=1e-9)
+        assert np.allclose(lats, [goompy.get_lat_from_y(v) for v in y], atol=1e-9)
+
+        xs = goompy.get_x_from_lon_array(lons)
+        ys = goompy.get_y_from_lat_array(lats)
+        assert np.all(np.abs(xs - [goompy.get_x_from_lon(v) for v in lons]) <= TEST_TOLERANCE)
+        assert np.all(np.abs(ys - [goompy.get_y_from_lat(v) for v in lats]) <= TEST_TOLERANCE)
+
+        xwin = goompy.get_xwin_from_lon_array(lons)
+        assert np.all(np.abs(xwin - [goompy.get_xwin_from_lon(v) for v in lons])
+                      <= TEST_TOLERANCE)
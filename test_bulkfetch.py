@@ -0,0 +1,72 @@
+'''tests for the bulk prefetch of regions
+'''
+import time
+import threading
+import http.client
+from goompy import _bulkfetch, GooMPy, TileKey, prefetch, estimate_prefetch
+from goompy._goompy_functions import _download_shared
+from goompy._bulkfetch import (_zoom_levels, _read_checkpoint, _write_checkpoint,
+                               _fetch_chunk)
+
+REGION = {'bbox': [52.45, 4.8, 52.3, 5.0], 'zooms': [13, 14], 'maptypes': ['roadmap']}
+
+
+def test_zoom_levels():
+    assert _zoom_levels('12') == [12]
+    assert _zoom_levels('10-12,15') == [10, 11, 12, 15]
+
+
+def test_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'region.json')
+    assert _read_checkpoint(checkpoint, REGION) == 0
+
+    _write_checkpoint(checkpoint, REGION, 128)
+    assert _read_checkpoint(checkpoint, REGION) == 128
+    assert _read_checkpoint(checkpoint, dict(REGION, zooms=[15])) == 0
+
+
+def test_prefetch_processes_after_view(stub_server):
+    # the worker processes must not inherit the sqlite connection and thread pools
+    view = GooMPy(400, 300, 52.375, 4.895, 14)
+    view.use_map_type('roadmap')
+
+    bbox = (52.39, 4.87, 52.36, 4.92)
+    result = prefetch(bbox, [15], ['roadmap'], processes=2)
+    assert result['failed'] == 0 and result['downloaded'] > 0
+    assert estimate_prefetch(bbox, [15], ['roadmap'])['requests'] == 0
+
+
+def test_view_shares_bulk_download(stub_server):
+    stub_server.latency = 0.3
+    key = TileKey('roadmap', 15, 320 + 640 * 6730, 320 + 640 * 4306)
+    bulk = threading.Thread(target=_fetch_chunk, args=([key],))
+    bulk.start()
+    time.sleep(0.1)
+
+    tile, owner = _download_shared(key)
+    bulk.join()
+    assert not owner and tile.image.size == (640, 640)
+    assert stub_server.requests == 1
+
+
+def test_resume_downloads_failed_tiles(stub_server, tmp_path):
+    checkpoint = str(tmp_path / 'region.json')
+    bbox = (52.39, 4.87, 52.36, 4.92)
+    stub_server.error_rate = 1
+    first = prefetch(bbox, [15], ['roadmap'], checkpoint=checkpoint)
+    assert first['failed'] == first['tiles'] > 0
+
+    stub_server.error_rate = 0
+    second = prefetch(bbox, [15], ['roadmap'], checkpoint=checkpoint)
+    assert second['failed'] == 0 and second['downloaded'] == first['failed']
+    assert estimate_prefetch(bbox, [15], ['roadmap'])['requests'] == 0
+
+
+def test_fetch_chunk_counts_http_errors(stub_server, monkeypatch):
+    def incomplete_read(key):
+        raise http.client.IncompleteRead(b'')
+
+    monkeypatch.setattr(_bulkfetch, '_download_shared', incomplete_read)
+    keys = [TileKey('roadmap', 15, 320 + 640 * (6730 + i), 320 + 640 * 4306)
+            for i in range(3)]
+    assert _fetch_chunk(keys) == (0, 3)
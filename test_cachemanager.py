@@ -0,0 +1,80 @@
+'''tests for the quota, time to live and verification of the tile store
+'''
+import time
+import sqlite3
+from io import BytesIO
+import PIL.Image
+from goompy import TileKey, SQLiteTileStore, CacheManager, _tilestore
+
+
+def jpeg():
+    jpgfile = BytesIO()
+    PIL.Image.new('RGB', (64, 64), (10, 20, 30)).save(jpgfile, format='JPEG')
+    return jpgfile.getvalue()
+
+
+def test_evicts_least_recently_accessed(tmp_path):
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    keys = [TileKey('roadmap', 10, 320 + 640 * i, 320) for i in range(4)]
+    store.put_many({key: b'x' * 1000 for key in keys})
+
+    # the first tile is the most recently accessed
+    time.sleep(1.1)
+    store.get(keys[0])
+
+    manager = CacheManager(store, max_bytes=2000)
+    assert manager.run_once() == {'expired': 0, 'evicted': 2}
+    assert store.contains_many(keys) == {keys[0], keys[3]}
+
+
+def test_access_times_written_without_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(_tilestore, '_ACCESS_BATCHSIZE', 10)
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    keys = [TileKey('roadmap', 10, 320 + 640 * i, 320) for i in range(25)]
+    store.put_many({key: b'x' for key in keys})
+
+    time.sleep(1.1)
+    for key in keys:
+        store.get(key)
+
+    # the access times of all but the last few tiles have been written
+    assert len(store._accessed) < 10
+    with sqlite3.connect(store.path) as db:
+        written = db.execute('SELECT count(*) FROM tiles WHERE accessed > created')
+        assert written.fetchone()[0] == 20
+
+
+def test_ttl_per_maptype(tmp_path):
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    road = TileKey('roadmap', 10, 320, 320)
+    satellite = TileKey('satellite', 10, 320, 320)
+    store.put_many({road: b'r', satellite: b's'})
+
+    CacheManager(store, ttl={'satellite': -1})
+    assert store.get_many([road, satellite]) == {road: b'r'}
+    assert store.delete_expired() == 1
+
+
+def test_verify_deletes_corrupt_tiles(tmp_path):
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    good = TileKey('roadmap', 10, 320, 320)
+    truncated = TileKey('roadmap', 10, 960, 320)
+    store.put_many({good: jpeg(), truncated: jpeg()[:200]})
+
+    assert store.verify() == 1
+    assert store.contains_many([good, truncated]) == {good}
+
+
+def test_adds_columns_to_old_stores(tmp_path):
+    path = str(tmp_path / 'tiles.mbtiles')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE tiles (maptype TEXT NOT NULL, zoom_level INTEGER NOT NULL, '
+               'tile_x INTEGER NOT NULL, tile_y INTEGER NOT NULL, tile_data BLOB NOT NULL, '
+               'PRIMARY KEY (maptype, zoom_level, tile_x, tile_y)) WITHOUT ROWID')
+    db.execute("INSERT INTO tiles VALUES ('roadmap', 10, 320, 320, x'00')")
+    db.commit()
+    db.close()
+
+    store = SQLiteTileStore(path)
+    assert store.get(TileKey('roadmap', 10, 320, 320)) == b'\x00'
+    assert store.info() == {'roadmap': {'tiles': 1, 'nbytes': 1}}
@@ -0,0 +1,72 @@
+'''tests for the pool of keep-alive connections against a stub of the static maps api
+'''
+import socket
+import threading
+import urllib.error
+import pytest
+from stub_server import StubServer
+from goompy._connection_pool import _ConnectionPool, _STALE_CONNECTION_ERRORS
+
+QUERY = 'center=52.37,4.89&zoom=15&size=64x64'
+
+
+@pytest.fixture
+def server():
+    server = StubServer(latency=0, jitter=0).start()
+    yield server
+    server.stop()
+
+
+def test_reuses_connection(server):
+    pool = _ConnectionPool(server.url)
+    for _ in range(10):
+        assert pool.get(QUERY)
+
+    assert server.requests == 10 and server.connections == 1
+
+
+def test_renews_connection_after_max_requests(server):
+    pool = _ConnectionPool(server.url, max_requests=3)
+    for _ in range(7):
+        pool.get(QUERY)
+
+    assert server.connections == 3
+
+
+def test_retries_stale_connection(server):
+    server.keepalive_requests = 1
+    pool = _ConnectionPool(server.url)
+    for _ in range(3):
+        assert pool.get(QUERY)
+
+    assert server.requests == 3 and server.connections == 3
+
+
+def test_error_status(server):
+    server.error_rate = 1
+    pool = _ConnectionPool(server.url)
+    with pytest.raises(urllib.error.HTTPError):
+        pool.get(QUERY)
+
+    server.error_rate = 0
+    assert pool.get(QUERY)
+
+
+def test_no_retry_on_new_connection():
+    # a server that closes every connection without answering
+    listener = socket.create_server(('127.0.0.1', 0))
+    accepted = []
+
+    def accept():
+        while True:
+            connection, _ = listener.accept()
+            accepted.append(connection)
+            connection.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    pool = _ConnectionPool(f'http://127.0.0.1:{listener.getsockname()[1]}/')
+    with pytest.raises(_STALE_CONNECTION_ERRORS):
+        pool.get(QUERY)
+
+    listener.close()
+    assert len(accepted) == 1
@@ -0,0 +1,183 @@
+'''tests for the views of GooMPy against a stub of the static maps api
+'''
+import time
+import random
+import asyncio
+import urllib.error
+import threading
+import pytest
+from goompy import GooMPy, _goompy_functions
+from goompy._mosaic import _grid_keys
+
+WIDTH = 800
+HEIGHT = 500
+LATITUDE = 52.3755
+LONGITUDE = 4.8994
+
+
+def test_refine_survives_failed_tiles(stub_server, monkeypatch, wait_idle):
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', errors.append)
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 14)
+    view.use_map_type('roadmap')
+
+    random.seed(1)
+    stub_server.error_rate = 0.3
+    view.use_zoom(15, preview=True)
+    mosaic = view.mosaic
+    wait_idle(stub_server)
+
+    # the window with a margin of half a tile, all but the failed tiles have arrived
+    keys = _grid_keys('roadmap', 15, mosaic.originx + view.leftx - 320,
+                      mosaic.originy + view.uppery - 320, WIDTH + 640, HEIGHT + 640, 640)
+    assert not errors and stub_server.errors > 0
+    assert sum(key in mosaic.tiles for key in keys) >= len(keys) - stub_server.errors
+
+
+def test_newer_async_zoom_cancels_older(stub_server):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 14)
+    view.use_map_type('roadmap')
+    mosaic = view.mosaic
+
+    async def zoom():
+        older = [asyncio.ensure_future(view.use_zoom_async(zoom)) for zoom in (15, 16)]
+        await asyncio.sleep(0.005)
+        newest = asyncio.ensure_future(view.use_zoom_async(17))
+        for task in older:
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        # the superseded requests have left the view untouched
+        assert view.zoom == 14 and view.mosaic is mosaic
+        await newest
+
+    asyncio.run(zoom())
+    assert view.zoom == 17 and view.mosaic.zoom == 17
+    assert view.mosaic.tiles and all(key.zoom == 17 for key in view.mosaic.tiles)
+
+
+def test_pan_past_mosaic_edge(stub_server, wait_idle):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15)
+    view.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    dx, dy = 3 * 640 + 100, -700
+    leftx, uppery = view.leftx, view.uppery
+    lon = view.get_lon_from_x(WIDTH / 2 + dx)
+    lat = view.get_lat_from_y(HEIGHT / 2 + dy)
+    mosaic = view.mosaic
+    keys = _grid_keys('roadmap', 15, mosaic.originx + leftx + dx - 320,
+                      mosaic.originy + uppery + dy - 320, WIDTH + 640, HEIGHT + 640, 640)
+    new_keys = [key for key in keys if key not in _goompy_functions._TILE_CACHE]
+    requests = stub_server.requests
+
+    view.move(dx, dy)
+    assert new_keys and stub_server.requests - requests == len(new_keys)
+    assert all(key in view.mosaic.tiles for key in keys)
+
+    assert (view.leftx, view.uppery) == (leftx + dx, uppery + dy)
+    assert abs(view.get_lon_from_x(WIDTH / 2) - lon) < 1e-9
+    assert abs(view.get_lat_from_y(HEIGHT / 2) - lat) < 1e-9
+    assert abs(view.get_xwin_from_lon(lon) - WIDTH / 2) <= 1
+    assert abs(view.get_ywin_from_lat(lat) - HEIGHT / 2) <= 1
+
+
+def test_pan_fetches_failed_tiles_again(stub_server, wait_idle):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15)
+    view.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    stub_server.error_rate = 1
+    with pytest.raises(urllib.error.HTTPError):
+        view.move(900, 0)
+
+    # the downloads still running when the move raised fail as well
+    wait_idle(stub_server)
+    stub_server.error_rate = 0
+    requests = stub_server.requests
+    view.move(1, 0)
+    mosaic = view.mosaic
+    keys = _grid_keys('roadmap', 15, mosaic.originx + view.leftx,
+                      mosaic.originy + view.uppery, WIDTH, HEIGHT, 640)
+    assert stub_server.requests > requests
+    assert all(key in mosaic.tiles for key in keys)
+
+
+def test_switch_back_to_cached_map_type(stub_server, wait_idle):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15)
+    view.use_map_type('roadmap')
+    roadmap = view.mosaic
+    view.use_map_type('satellite')
+    wait_idle(stub_server)
+
+    requests = stub_server.requests
+    view.use_map_type('roadmap')
+    assert view.mosaic is roadmap and stub_server.requests == requests
+
+
+def test_fill_maptypes_loads_other_layers(stub_server, wait_idle):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15,
+                  fill_maptypes=('satellite', 'terrain'))
+    view.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    requests = stub_server.requests
+    for maptype in ('satellite', 'terrain'):
+        view.use_map_type(maptype)
+        mosaic = view.mosaic
+        keys = _grid_keys(maptype, 15, mosaic.originx + view.leftx,
+                          mosaic.originy + view.uppery, WIDTH, HEIGHT, 640)
+        assert all(key in mosaic.tiles for key in keys)
+
+    assert stub_server.requests == requests
+
+
+def test_fill_maptypes_leaves_burst_to_view(stub_server, wait_idle):
+    view = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15)
+    view.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    # with less than half the burst left for the view, the fill waits
+    limiter = _goompy_functions._RATE_LIMITER
+    limiter.configure(1, 8)
+    limiter.acquire(5)
+    view.fill_maptypes = ('satellite',)
+    view._fill_layers()
+    requests = stub_server.requests
+    time.sleep(0.5)
+    assert stub_server.requests == requests
+
+    limiter.configure(1000, 8)
+    end = time.monotonic() + 5
+    while stub_server.requests == requests and time.monotonic() < end:
+        time.sleep(0.1)
+
+    assert stub_server.requests > requests
+
+
+def test_copy_image_waits_for_update(make_goompy):
+    view = make_goompy(LATITUDE, LONGITUDE, 15)
+    copies = []
+    with view._lock:
+        copier = threading.Thread(target=lambda: copies.append(view.copy_image()))
+        copier.start()
+        copier.join(0.1)
+        assert not copies
+
+    copier.join()
+    assert copies[0] is not view.get_image()
+    assert copies[0].tobytes() == view.get_image().tobytes()
+
+
+def test_nearby_views_share_grid_tiles(stub_server, wait_idle):
+    # two views about 7 meters apart
+    first = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE, 15)
+    first.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    requests = stub_server.requests
+    second = GooMPy(WIDTH, HEIGHT, LATITUDE, LONGITUDE + 0.0001, 15)
+    second.use_map_type('roadmap')
+    assert second.mosaic.originx != first.mosaic.originx
+    assert first.mosaic.tiles and set(second.mosaic.tiles) == set(first.mosaic.tiles)
+    assert stub_server.requests == requests
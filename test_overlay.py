@@ -0,0 +1,40 @@
+'''the overlay spatial index must return the same points as a brute force search
+'''
+import numpy as np
+from goompy import Overlay
+
+WIDTH = 800
+HEIGHT = 500
+LATITUDE = 52.3755
+LONGITUDE = 4.8994
+
+
+def make_overlay():
+    rng = np.random.default_rng(1)
+    overlay = Overlay()
+    overlay.add_points(rng.uniform(LATITUDE - 1, LATITUDE + 1, 50000),
+                       rng.uniform(LONGITUDE - 1, LONGITUDE + 1, 50000))
+    return overlay
+
+
+def test_query_matches_brute_force(make_goompy):
+    overlay = make_overlay()
+    for zoom in (8, 12, 15):
+        goompy = make_goompy(LATITUDE, LONGITUDE, zoom)
+        indices, x, y = overlay.query(goompy)
+
+        allx = goompy.get_xwin_from_lon_array(overlay.lons)
+        ally = goompy.get_ywin_from_lat_array(overlay.lats)
+        inside = (allx >= 0) & (allx < WIDTH) & (ally >= 0) & (ally < HEIGHT)
+        assert np.array_equal(np.sort(indices), np.flatnonzero(inside))
+        assert np.array_equal(x, allx[indices]) and np.array_equal(y, ally[indices])
+
+
+def test_cluster_counts_all_visible_points(make_goompy):
+    overlay = make_overlay()
+    goompy = make_goompy(LATITUDE, LONGITUDE, 8)
+    x, y, counts = overlay.cluster(goompy)
+
+    assert counts.sum() == len(overlay.query(goompy)[0])
+    assert len(counts) < counts.sum()
+    assert np.all((x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT))
@@ -0,0 +1,77 @@
+'''tests for the background prefetch of the tiles ahead of the view
+'''
+import time
+from goompy import GooMPy, Prefetcher, _goompy_functions
+from goompy._mosaic import _TileMosaic, _grid_keys
+
+LATITUDE = 52.3755
+LONGITUDE = 4.8994
+
+
+def queued_keys(prefetcher):
+    return [key for _, _, key in sorted(prefetcher._heap)]
+
+
+def moving_view(make_goompy, prefetcher, dx):
+    view = make_goompy(LATITUDE, LONGITUDE, 15)
+    view.mosaic = _TileMosaic('roadmap', 15, 640 * 6729, 640 * 4305, 4, 640)
+    prefetcher.record_move(view, dx, 0)
+    time.sleep(0.1)
+    prefetcher.record_move(view, dx, 0)
+    return view
+
+
+def test_tiles_ahead_before_next_zoom(make_goompy):
+    prefetcher = Prefetcher(nworkers=0, maxsize=100)
+    view = moving_view(make_goompy, prefetcher, 200)
+    mosaic = view.mosaic
+    visible = _grid_keys('roadmap', 15, mosaic.originx + view.leftx,
+                         mosaic.originy + view.uppery, view.width, view.height, 640)
+
+    keys = queued_keys(prefetcher)
+    zooms = [key.zoom for key in keys]
+    assert zooms == sorted(zooms) and zooms[-1] == 16
+    assert set(keys[:len(visible)]) == set(visible)
+
+    # the tiles ahead are right of the window, in the direction of the moves
+    ahead = keys[len(visible):zooms.index(16)]
+    right = mosaic.originx + view.leftx + view.width
+    assert ahead and all(key.x + 320 > right for key in ahead)
+
+
+def test_queue_within_maxsize(make_goompy):
+    prefetcher = Prefetcher(nworkers=0, maxsize=8)
+    view = moving_view(make_goompy, prefetcher, -200)
+    mosaic = view.mosaic
+    visible = _grid_keys('roadmap', 15, mosaic.originx + view.leftx,
+                         mosaic.originy + view.uppery, view.width, view.height, 640)
+
+    keys = queued_keys(prefetcher)
+    assert len(keys) == 8 and set(visible) <= set(keys)
+
+
+def test_leaves_burst_to_view(stub_server, wait_idle):
+    view = GooMPy(800, 500, LATITUDE, LONGITUDE, 15)
+    view.use_map_type('roadmap')
+    wait_idle(stub_server)
+
+    # with less than half the burst left for the view, the tiles are not downloaded
+    limiter = _goompy_functions._RATE_LIMITER
+    limiter.configure(1, 8)
+    limiter.acquire(5)
+    requests = stub_server.requests
+    prefetcher = Prefetcher(nworkers=1)
+    try:
+        prefetcher.schedule(view)
+        time.sleep(0.5)
+        assert stub_server.requests == requests
+
+        limiter.configure(1000, 8)
+        end = time.monotonic() + 5
+        while stub_server.requests == requests and time.monotonic() < end:
+            time.sleep(0.1)
+
+        assert stub_server.requests > requests
+
+    finally:
+        prefetcher.stop()
@@ -0,0 +1,23 @@
+'''tests for composing tiles from the tiles at the next zoom level
+'''
+import PIL.Image
+from goompy import TileKey
+from goompy._tilecache import _Tile
+from goompy._pyramid import _child_keys, _compose_parent
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 255)]
+
+
+def test_child_keys():
+    key = TileKey('roadmap', 12, 3 * 640 + 320, 5 * 640 + 320)
+    children = _child_keys(key, 640)
+    assert [(child.x // 640, child.y // 640) for child in children] == [
+        (6, 10), (7, 10), (6, 11), (7, 11)]
+    assert all(child.zoom == 13 and child.x % 640 == 320 for child in children)
+
+
+def test_compose_parent():
+    children = [_Tile(image=PIL.Image.new('RGB', (64, 64), color)) for color in COLORS]
+    parent = _compose_parent(children, 64)
+    assert parent.size == (64, 64)
+    assert [parent.getpixel(xy) for xy in ((16, 16), (48, 16), (16, 48), (48, 48))] == COLORS
@@ -0,0 +1,34 @@
+'''tests for the token buckets of the rate limit, also shared by processes
+'''
+import time
+import multiprocessing
+from goompy._ratelimit import _TokenBucket, _SharedTokenBucket
+
+
+def test_burst_and_sustained_rate():
+    bucket = _TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    assert sum(bucket.acquire() for _ in range(5)) == 0
+
+    # after the burst the tokens come at the rate
+    waited = sum(bucket.acquire() for _ in range(10))
+    elapsed = time.monotonic() - start
+    assert 0.18 < waited and 0.18 < elapsed < 0.4
+    assert bucket.available() < 1
+
+
+def take_tokens(bucket, tokens):
+    bucket.acquire(tokens)
+
+
+def test_shared_token_bucket():
+    bucket = _SharedTokenBucket(rate=0.001, burst=4)
+    process = multiprocessing.Process(target=take_tokens, args=(bucket, 4))
+    process.start()
+    process.join()
+
+    assert process.exitcode == 0
+    assert bucket._tokens < 1
+
+    bucket.configure(1000, 2)
+    assert bucket.acquire(2) < 0.1
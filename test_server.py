@@ -0,0 +1,42 @@
+'''tests for the parameters of the map rendering server
+'''
+import threading
+import http.client
+import pytest
+from goompy import MapServer, _server
+from goompy._server import _View
+
+
+def test_views_are_normalized():
+    view = _View.from_query('lat=52.370001&lon=4.89&zoom=15&width=800&height=500')
+    assert view == _View.from_query(
+        'lat=52.37&lon=4.89&zoom=15&width=800&height=500&maptype=roadmap&format=PNG')
+
+
+@pytest.mark.parametrize('query', [
+    'lat=52.37&zoom=15', 'lat=52.37&lon=4.89&zoom=25', 'lat=x&lon=4.89&zoom=15',
+    'lat=52.37&lon=4.89&zoom=15&width=5000', 'lat=52.37&lon=4.89&zoom=15&format=gif',
+    'lat=inf&lon=4.89&zoom=15', 'lat=52.37&lon=nan&zoom=15'])
+def test_invalid_views(query):
+    with pytest.raises(ValueError):
+        _View.from_query(query)
+
+
+def test_render_errors(monkeypatch):
+    def render(view):
+        raise RuntimeError('google api key required')
+
+    monkeypatch.setattr(_server, '_render', render)
+    server = MapServer(('127.0.0.1', 0), workers=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for query, status in (('lat=inf&lon=4.89&zoom=15', 400),
+                              ('lat=52.37&lon=4.89&zoom=15', 500)):
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+            connection.request('GET', '/map?' + query)
+            assert connection.getresponse().status == status
+            connection.close()
+
+    finally:
+        server.shutdown()
+        server.server_close()
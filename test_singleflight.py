@@ -0,0 +1,46 @@
+'''tests for the single flight of concurrent calls for the same key
+'''
+import time
+import threading
+from goompy import TileKey, _goompy_functions
+from goompy._singleflight import _SingleFlight
+from goompy._tilecache import _TileCache
+
+
+def test_concurrent_calls_share_one_call():
+    flight = _SingleFlight()
+    calls = []
+    results = []
+
+    def download(key):
+        calls.append(key)
+        time.sleep(0.2)
+        return key * 2
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do(3, download, 3)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert calls == [3]
+    assert sorted(results) == [(6, False)] * 4 + [(6, True)]
+    assert len(flight) == 0
+
+
+def test_download_finished_before_flight(stub_server, monkeypatch):
+    class RacedCache(_TileCache):
+        # the look in the cache is made just before the previous download stores the tile
+        def __contains__(self, key):
+            return False
+
+    cache = RacedCache(2**24)
+    monkeypatch.setattr(_goompy_functions, '_TILE_CACHE', cache)
+    key = TileKey('roadmap', 15, 320 + 640 * 6730, 320 + 640 * 4306)
+    tile, owner = _goompy_functions._download_shared(key)
+    assert owner and stub_server.requests == 1
+
+    assert _goompy_functions._download_shared(key) == (tile, False)
+    assert stub_server.requests == 1
@@ -0,0 +1,24 @@
+'''tests for the snapshots of the last view
+'''
+import pytest
+import PIL.Image
+from goompy._goompy_functions import _write_snapshot, _read_snapshot
+
+VIEW = {'latitude': 52.3755, 'longitude': 4.8994, 'zoom': 15, 'maptype': 'roadmap'}
+
+
+def test_snapshot(tmp_path):
+    path = str(tmp_path / 'last_view.png')
+    image = PIL.Image.new('RGB', (80, 50), (10, 20, 30))
+    _write_snapshot(path, image, VIEW)
+
+    snapshot, view = _read_snapshot(path)
+    assert view == VIEW
+    assert snapshot.size == (80, 50) and snapshot.getpixel((0, 0)) == (10, 20, 30)
+
+
+def test_no_snapshot(tmp_path):
+    path = str(tmp_path / 'plain.png')
+    PIL.Image.new('RGB', (8, 8)).save(path)
+    with pytest.raises(ValueError):
+        _read_snapshot(path)
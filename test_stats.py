@@ -0,0 +1,25 @@
+'''tests for the timings and counters of the stages
+'''
+from goompy import Stats
+
+
+def test_timings_counters_and_hooks():
+    stats = Stats()
+    timed = []
+    stats.add_hook(lambda stage, seconds: timed.append(stage))
+
+    with stats.timer('decode'):
+        pass
+
+    stats.record('decode', 0.5)
+    stats.count('bytes_downloaded', 1000)
+    stats.count('bytes_downloaded', 24)
+
+    snapshot = stats.snapshot()
+    assert snapshot['timings']['decode']['count'] == 2
+    assert snapshot['timings']['decode']['max'] == 0.5
+    assert snapshot['counters'] == {'bytes_downloaded': 1024}
+    assert timed == ['decode', 'decode']
+
+    stats.reset()
+    assert stats.snapshot() == {'timings': {}, 'counters': {}}
@@ -0,0 +1,67 @@
+'''tests for the least recently used cache of tiles, tiles are decoded when used
+'''
+from io import BytesIO
+import PIL.Image
+from goompy import TileKey
+from goompy._tilecache import _TileCache, _Tile
+from goompy._mosaic import _TileMosaic
+
+TILE_BYTES = 640 * 640 * 3
+
+
+def new_tile():
+    return _Tile(image=PIL.Image.new('RGB', (640, 640)))
+
+
+def test_evicts_least_recently_used():
+    cache = _TileCache(3 * TILE_BYTES)
+    for key in 'abc':
+        cache.put(key, new_tile())
+
+    assert cache.get('a') is not None
+    cache.put('d', new_tile())
+
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.nbytes == 3 * TILE_BYTES
+
+
+def test_hits_and_misses():
+    cache = _TileCache(TILE_BYTES)
+    cache.put('a', new_tile())
+    cache.get('a')
+    cache.get('b')
+
+    info = cache.info()
+    assert (info['hits'], info['misses']) == (1, 1)
+
+    cache.resize(0)
+    assert len(cache) == 0 and cache.info()['evictions'] == 1
+
+
+def test_tile_decodes_lazily():
+    jpgfile = BytesIO()
+    PIL.Image.new('RGB', (640, 640), (200, 100, 50)).save(jpgfile, format='JPEG')
+    tile = _Tile(jpgfile.getvalue())
+    assert tile.size == (640, 640) and tile._image is None
+
+    assert tile.reduced(160).size == (160, 160)
+    assert tile._image is None
+
+    assert tile.image.mode == 'RGB' and tile.image.size == (640, 640)
+
+
+def test_counts_size_when_put():
+    # mosaics grow while they are cached as map type layers
+    mosaic = _TileMosaic('roadmap', 12, 0, 0, 3, 640)
+    mosaic.cover(0, 0, 640, 640)
+    cache = _TileCache(3 * TILE_BYTES)
+    cache.put('roadmap', mosaic)
+    assert cache.nbytes == 0
+
+    mosaic.paste(TileKey('roadmap', 12, 320, 320), new_tile())
+    cache.put('roadmap', mosaic)
+    assert cache.nbytes == TILE_BYTES
+
+    cache.resize(0)
+    assert len(cache) == 0 and cache.nbytes == 0
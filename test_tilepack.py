@@ -0,0 +1,45 @@
+'''tests for the memory mapped packs of raw tiles
+'''
+import PIL.Image
+from goompy import TileKey, TilePack, _goompy_functions
+from goompy._tilepack import _write_tile_pack
+from goompy._mosaic import _paste_tile
+
+KEYS = [TileKey(maptype, 12, 320 + 640 * i, 960) for maptype in ('roadmap', 'satellite')
+        for i in range(3)]
+
+
+def test_tile_pack(tmp_path):
+    path = str(tmp_path / 'region.pack')
+    images = {key: PIL.Image.new('RGB', (64, 64), (i, 2 * i, 3 * i))
+              for i, key in enumerate(KEYS)}
+    _write_tile_pack(path, KEYS, reversed(list(images.items())), 64)
+
+    pack = TilePack(path)
+    assert len(pack) == len(KEYS)
+    for key, image in images.items():
+        tile = pack.get(key)
+        assert tile.size == (64, 64)
+        assert tile.convert('RGB').tobytes() == image.tobytes()
+
+    assert pack.get(TileKey('terrain', 12, 320, 960)) is None
+
+
+def test_pack_tiles_composed_without_copy(tmp_path, monkeypatch):
+    path = str(tmp_path / 'region.pack')
+    images = {key: PIL.Image.new('RGB', (64, 64), (i, 2 * i, 3 * i))
+              for i, key in enumerate(KEYS)}
+    _write_tile_pack(path, KEYS, images.items(), 64)
+    monkeypatch.setattr(_goompy_functions, '_TILE_PACKS', [TilePack(path)])
+    _goompy_functions._TILE_CACHE.clear()
+
+    # the tiles stay mapped onto the pack and out of the tiles cache
+    tile = _goompy_functions._cached_tiles(KEYS[:1])[KEYS[0]]
+    assert tile.image.mode == 'RGBX' and tile.image.readonly
+    assert KEYS[0] not in _goompy_functions._TILE_CACHE
+
+    image = PIL.Image.new('RGB', (80, 50))
+    _paste_tile(image, tile.image, -10, 20)
+    expected = PIL.Image.new('RGB', (80, 50))
+    expected.paste(images[KEYS[0]], (-10, 20))
+    assert image.tobytes() == expected.tobytes()
@@ -0,0 +1,46 @@
+'''tests for the tile stores, lookups and inserts are done in batches
+'''
+import pickle
+from goompy import TileKey, SQLiteTileStore, DirectoryTileStore
+
+KEYS = [TileKey('roadmap', 15, 1000 + 640 * i, 2000 + 640 * j)
+        for i in range(30) for j in range(30)]
+
+
+def check_store(store):
+    tiles = {key: bytes(f'{key.x}_{key.y}', 'ascii') for key in KEYS[::2]}
+    store.put_many(tiles)
+
+    found = store.get_many(KEYS)
+    assert found == tiles
+    assert store.get(TileKey('satellite', 15, 1000, 2000)) is None
+    assert store.contains_many(KEYS) == set(tiles)
+
+
+def test_sqlite_tile_store(tmp_path):
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    check_store(store)
+    store.close()
+
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    assert len(store.get_many(KEYS)) == len(KEYS[::2])
+
+
+def test_sqlite_tile_store_pickled_with_ttl(tmp_path):
+    store = SQLiteTileStore(str(tmp_path / 'tiles.mbtiles'))
+    store.ttl = {'satellite': -1}
+    store.put_many({KEYS[0]: b'roadmap', KEYS[0]._replace(maptype='satellite'): b'old'})
+
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.path == store.path and copy.ttl == {'satellite': -1}
+    assert set(copy.get_many([KEYS[0], KEYS[0]._replace(maptype='satellite')])) == {KEYS[0]}
+
+
+def test_directory_tile_store(tmp_path):
+    check_store(DirectoryTileStore(str(tmp_path)))
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_tile_key_latlon():
+    lat, lon = TileKey('roadmap', 0, 128, 128).latlon
+    assert abs(lat) < 1e-9 and abs(lon) < 1e-9
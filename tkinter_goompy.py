@@ -16,14 +16,13 @@ along with this code.  If not, see <http://www.gnu.org/licenses/>.
 
 Updated by Bruno Vermeulen @2019
 '''
+import os
 import tkinter as tk
-from PIL import ImageTk
-from goompy import GooMPy
+from goompy import GooMPy, Prefetcher, Overlay, MapWidget
 
 WIDTH = 640
 HEIGHT = 640
-MAX_SYMBOL_SIZE = 100
-DEFAULT_SYMBOL_SIZE = 7
+CLUSTER_ZOOM = 12  # Points are clustered below this zoom level
 
 LATITUDE = 13.8135822
 LONGITUDE = 99.7146769
@@ -35,6 +34,7 @@ LONGITUDE = 99.7146769
 ZOOM = 10
 RADIUS = 500
 MAPTYPE = 'roadmap'
+SNAPSHOT = os.path.join(os.path.expanduser('~'), '.goompy', 'last_view.png')
 
 
 class UI(tk.Tk):
@@ -45,14 +45,27 @@ class UI(tk.Tk):
         self.geometry(f'{WIDTH}x{HEIGHT}')
         self.title('GooMPy')
 
-        self.canvas = tk.Canvas(self, width=WIDTH, height=HEIGHT)
-        self.canvas.pack(fill='both')
+        self.overlay = Overlay()
+        self.overlay.add_points([LATITUDE], [LONGITUDE])
+
+        # the last view is shown at once, its tiles are checked in the background
+        try:
+            self.goompy = GooMPy.from_snapshot(SNAPSHOT, prefetcher=Prefetcher())
+
+        except (OSError, ValueError):
+            self.goompy = GooMPy(
+                WIDTH, HEIGHT, LATITUDE, LONGITUDE, ZOOM, radius_meters=RADIUS,
+                prefetcher=Prefetcher())
+            self.goompy.use_map_type(MAPTYPE)
+
+        self.map = MapWidget(self, self.goompy, overlay=self.overlay,
+                             cluster_zoom=CLUSTER_ZOOM)
+        self.map.pack(fill='both')
 
         self.bind("<Key>", self.check_quit)
-        self.bind('<B1-Motion>', self.drag)
-        self.bind('<Button-1>', self.click)
+        self.map.bind('<Button-1>', self.click, add='+')
 
-        self.radiogroup = tk.Frame(self.canvas)
+        self.radiogroup = tk.Frame(self.map)
         self.radiovar = tk.IntVar()
         self.maptypes = ['roadmap', 'terrain', 'satellite', 'hybrid']
         self.add_radio_button(0)
@@ -63,18 +76,17 @@ class UI(tk.Tk):
         self.zoom_in_button = self.add_zoom_button('+', +1)
         self.zoom_out_button = self.add_zoom_button('-', -1)
 
-        self.zoomlevel = ZOOM
-        self.radiovar.set(0)
-
-        self.goompy = GooMPy(
-            WIDTH, HEIGHT, LATITUDE, LONGITUDE, ZOOM, radius_meters=RADIUS)
+        self.zoomlevel = self.goompy.get_zoom
+        self.radiovar.set(self.maptypes.index(self.goompy.maptype))
 
-        self.goompy.use_map_type(MAPTYPE)
-        self.redraw()
+        # the controls stay in place, only the map and overlay are redrawn
+        self.radiogroup.place(x=0, y=0)
+        self.zoom_in_button.place(x=WIDTH - 50, y=HEIGHT - 80)
+        self.zoom_out_button.place(x=WIDTH - 50, y=HEIGHT - 50)
 
     def add_zoom_button(self, text, sign):
         button = tk.Button(
-            self.canvas, text=text, width=1, command=lambda: self.zoom(sign))
+            self.map, text=text, width=1, command=lambda: self.zoom(sign))
         return button
 
     def set_cursor_to_normal(self):
@@ -92,72 +104,29 @@ class UI(tk.Tk):
                        command=lambda: self.usemap(maptype)).grid(row=0, column=index)
 
     def click(self, event):
-        self.coords = event.x, event.y
-        lon = self.goompy.get_lon_from_x(self.coords[0])
-        lat = self.goompy.get_lat_from_y(self.coords[1])
+        lon = self.goompy.get_lon_from_x(event.x)
+        lat = self.goompy.get_lat_from_y(event.y)
 
         # TODO debug print statement
-        print(f'x: {self.coords[0]}, y: {self.coords[1]} '
+        print(f'x: {event.x}, y: {event.y} '
               f'lon: {lon:.4f}, lat: {lat:.4f}')
 
-    def drag(self, event):
-        self.goompy.move(self.coords[0] - event.x, self.coords[1] - event.y)
-        self.redraw()
-        self.coords = event.x, event.y
-
-    def redraw(self):
-        # clear the canvas
-        self.canvas.delete('all')
-
-        image = self.goompy.get_image()
-        self.my_image = ImageTk.PhotoImage(image)
-        self.canvas.create_image(0, 0, image=self.my_image, anchor='nw')
-
-        self.radiogroup.place(x=0, y=0)
-
-        x = int(self.canvas['width']) - 50
-        y = int(self.canvas['height']) - 80
-        self.zoom_in_button.place(x=x, y=y)
-        self.zoom_out_button.place(x=x, y=y + 30)
-
-        self.draw_point(LATITUDE, LONGITUDE, fill='blue')
-
     def usemap(self, maptype):
         self.set_cursor_to_wait()
-        self.goompy.use_map_type(maptype)
+        self.map.use_map_type(maptype)
         self.set_cursor_to_normal()
-        self.redraw()
 
     def zoom(self, sign):
-        self.set_cursor_to_wait()
         self.zoomlevel = self.goompy.get_zoom
         newlevel = self.zoomlevel + sign
         if 0 < newlevel < 22:
             self.zoomlevel = newlevel
-            self.goompy.use_zoom(newlevel)
-            self.redraw()
-
-        self.set_cursor_to_normal()
-
-    def draw_point(self, lat, lon, size=None, **kwargs):
-        x = self.goompy.get_xwin_from_lon(lon)
-        y = self.goompy.get_ywin_from_lat(lat)
-
-        if size is None:
-            size = int(DEFAULT_SYMBOL_SIZE / 2)
-
-        elif not -1 < size <= MAX_SYMBOL_SIZE:
-            raise ValueError(f'size drawing object must be positive and '
-                             f'less than {MAX_SYMBOL_SIZE + 1}')
-
-        else:
-            size = int(size/2)
-
-        bbox = (x - size, y - size, x + size, y + size)
-        self.canvas.create_oval(*bbox, **kwargs)
+            self.map.use_zoom(newlevel)
 
     def check_quit(self, event):
         if ord(event.char) == 27:  # ESC
+            os.makedirs(os.path.dirname(SNAPSHOT), exist_ok=True)
+            self.goompy.save_snapshot(SNAPSHOT)
             exit(0)
 
 